@@ -0,0 +1,144 @@
+"""Persistent analysis cache shared by engine processes on one host.
+
+    cache = AnalysisCache("analysis.db", max_entries=200000)
+    bot = ChessBot(BLACK, 4, cache=cache)
+
+Finished searches are stored in SQLite by position key and depth, with
+the best move, score and principal variation. ChessBot probes the cache
+before searching and fills it afterwards, so positions analysed before
+(common openings, repeated middlegames) cost a single lookup. The
+database runs in WAL mode, so many processes can read it while one
+writes. A probe is a plain SELECT: the hits it finds are remembered and
+their last-used times written with the next store, so readers never wait
+for the write lock. The least recently used entries are evicted once the
+cache grows past max_entries.
+
+Scores are stored from White's point of view. Bump CACHE_VERSION when
+the evaluation changes, older entries are then dropped on open.
+"""
+import sqlite3
+import threading
+import time
+
+from example import WHITE
+
+CACHE_VERSION = 4
+EVICT_EVERY = 100      # Stores between size checks
+EVICT_FRACTION = 0.1   # Share of the cap freed by one eviction
+
+def _signed(key):
+    """Map a 64-bit Zobrist key into SQLite's signed INTEGER range"""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+class AnalysisCache:
+    def __init__(self, path, max_entries=100000, timeout=5.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._stores = 0
+        self._touched = {}  # (key, depth) -> last use of hits not yet written
+        self._lock = threading.Lock()  # Pondering threads share the connection
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+                    self._db.execute("DROP TABLE IF EXISTS analysis")
+                    self._db.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS analysis (
+                        key INTEGER NOT NULL,
+                        depth INTEGER NOT NULL,
+                        move INTEGER NOT NULL,
+                        score REAL,
+                        pv TEXT NOT NULL,
+                        last_used REAL NOT NULL,
+                        PRIMARY KEY (key, depth)
+                    )""")
+                self._db.execute("CREATE INDEX IF NOT EXISTS analysis_lru ON analysis (last_used)")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def probe(self, key, depth, side):
+        """Deepest stored result for the position searched to at least `depth`
+
+        Returns (move, score, pv) with the score from `side`'s point of
+        view, or None.
+        """
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT depth, move, score, pv FROM analysis WHERE key = ? AND depth >= ? "
+                    "ORDER BY depth DESC LIMIT 1", (_signed(key), depth)).fetchone()
+                if row is not None:
+                    self._touched[(_signed(key), row[0])] = time.time()
+            except sqlite3.OperationalError:
+                row = None  # Busy for longer than the timeout, e.g. during a checkpoint
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        _, move, score, pv = row
+        if score is not None and side != WHITE:
+            score = -score
+        return move, score, [int(m) for m in pv.split(",") if m]
+
+    def store(self, key, depth, side, move, score, pv):
+        """Store a finished search, with the score from `side`'s point of view"""
+        if score is not None and side != WHITE:
+            score = -score
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                return  # Another process holds the write lock, skip this entry
+            try:
+                self._write_touched()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO analysis (key, depth, move, score, pv, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (_signed(key), depth, move, score, ",".join(map(str, pv)), time.time()))
+                self._stores += 1
+                if self._stores % EVICT_EVERY == 0:
+                    self._evict()
+                self._db.execute("COMMIT")
+                self._touched.clear()
+            except sqlite3.OperationalError:
+                self._db.execute("ROLLBACK")
+
+    def _write_touched(self):
+        """Write the last-used times of the hits since the last store"""
+        if self._touched:
+            self._db.executemany("UPDATE analysis SET last_used = ? WHERE key = ? AND depth = ?",
+                                 [(used, key, depth) for (key, depth), used in self._touched.items()])
+
+    def _evict(self):
+        count = self._db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries + int(self.max_entries * EVICT_FRACTION)
+            self._db.execute("DELETE FROM analysis WHERE rowid IN "
+                             "(SELECT rowid FROM analysis ORDER BY last_used LIMIT ?)", (excess,))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM analysis")
+
+    def close(self):
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._write_touched()
+                self._db.execute("COMMIT")
+            except sqlite3.OperationalError:
+                pass  # The touches only steer eviction, losing them is harmless
+            self._db.close()
@@ -0,0 +1,321 @@
+"""Benchmark suite for the chess engine.
+
+    python bench.py                           # print a report
+    python bench.py --output bench.json       # save the results as JSON
+    python bench.py --baseline bench.json     # compare against saved results
+    python example.py bench ...               # same, from the game CLI
+
+Micro benchmarks time the hot primitives of ChessGame and ChessBot on a
+fixed set of positions. The whole micro suite runs several times, each
+run timing every benchmark over several rounds. The median of the run
+medians is the result. Its noise is the larger of two spreads: the one
+between rounds and the one between runs. A machine that slows down for
+a moment therefore widens the allowance instead of failing the
+comparison.
+
+The search benchmark runs get_best_move at fixed depths. Its total node
+count is deterministic and serves as a signature: it only changes when
+the search itself changes, not with machine speed.
+
+When comparing against a baseline, the medians are compared. A benchmark
+counts as a regression when it is slower by more than the threshold plus
+twice the larger noise of the two reports. The search speed, measured
+once, gets the threshold plus a fixed SEARCH_NOISE. The exit status is 1
+on a regression, so the suite can gate CI.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from example import ChessBot, ChessGame, MoveList, WHITE, BLACK
+
+BENCH_VERSION = 2
+POSITIONS = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("italian", "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQK2R b KQkq - 0 5"),
+    ("promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"),
+    ("rook_endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("minor_endgame", "8/5pk1/6p1/3B4/4n3/6P1/5PK1/8 b - - 0 40"),
+]
+DEFAULT_DEPTHS = (1, 2, 3)
+DEFAULT_ROUNDS = 5
+DEFAULT_RUNS = 3
+DEFAULT_THRESHOLD = 0.08  # Allowed slowdown on top of the measured noise
+SEARCH_NOISE = 0.05  # Extra allowance for the search speed, which is measured once
+
+def load_positions():
+    games = []
+    for name, fen in POSITIONS:
+        game = ChessGame()
+        game.load_fen(fen)
+        games.append((name, game))
+    return games
+
+# ========================
+# Micro benchmarks
+# ========================
+# Each benchmark gets the positions and returns a function that runs one
+# pass over them and returns the number of calls it made.
+def _bench_legal_moves(games):
+    pieces = [(game, p) for _, game in games for p in game.pieces.values()
+              if p.alive and p.side == game.to_move]
+    def run():
+        for game, piece in pieces:
+            game.legal_moves(piece)
+        return len(pieces)
+    return run
+
+def _bench_pseudo_legal_moves(games):
+    pieces = [(game, p) for _, game in games for p in game.pieces.values()
+              if p.alive and p.side == game.to_move]
+    def run():
+        for game, piece in pieces:
+            game.get_pseudo_legal_moves(piece)
+        return len(pieces)
+    return run
+
+def _bench_generate_moves(games):
+    move_list = MoveList()
+    def run():
+        for _, game in games:
+            game.generate_moves(move_list)
+        return len(games)
+    return run
+
+def _bench_is_square_attacked(games):
+    def run():
+        for _, game in games:
+            for x in range(8):
+                for y in range(8):
+                    game.is_square_attacked(x, y, WHITE)
+                    game.is_square_attacked(x, y, BLACK)
+        return len(games) * 128
+    return run
+
+def _bench_is_in_check(games):
+    def run():
+        for _, game in games:
+            game.is_in_check(WHITE)
+            game.is_in_check(BLACK)
+        return len(games) * 2
+    return run
+
+def _bench_evaluate_position(games):
+    bots = [(game, ChessBot(game.to_move, 1)) for _, game in games]
+    def run():
+        for game, bot in bots:
+            bot.evaluate_position(game)
+        return len(bots)
+    return run
+
+def _bench_make_unmake(games):
+    moves = []
+    for _, game in games:
+        move_list = MoveList()
+        game.generate_moves(move_list)
+        moves.extend((game, move) for move in move_list)
+    def run():
+        for game, move in moves:
+            undo = game.make_move(move)
+            game.unmake_move(move, undo)
+        return len(moves)
+    return run
+
+def _bench_copy(games):
+    def run():
+        for _, game in games:
+            game.copy()
+        return len(games)
+    return run
+
+MICRO_BENCHMARKS = {
+    "legal_moves": _bench_legal_moves,
+    "get_pseudo_legal_moves": _bench_pseudo_legal_moves,
+    "generate_moves": _bench_generate_moves,
+    "is_square_attacked": _bench_is_square_attacked,
+    "is_in_check": _bench_is_in_check,
+    "evaluate_position": _bench_evaluate_position,
+    "make_unmake": _bench_make_unmake,
+    "copy": _bench_copy,
+}
+
+def time_micro(name, games, rounds=DEFAULT_ROUNDS, min_time=0.05):
+    """Time one run of a micro benchmark, returning nanoseconds per call"""
+    run = MICRO_BENCHMARKS[name](games)
+    # Repeat the pass until a round takes at least min_time
+    passes = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(passes):
+            run()
+        if time.perf_counter() - start >= min_time or passes >= 1 << 16:
+            break
+        passes *= 2
+    calls = run() * passes
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(passes):
+            run()
+        samples.append((time.perf_counter() - start) * 1e9 / calls)
+    samples.sort()
+    best, median = samples[0], samples[len(samples) // 2]
+    return {"ns_per_call": best, "median_ns": median,
+            "noise": (median - best) / best if best > 0 else 0.0, "calls": calls}
+
+# ========================
+# Search benchmark
+# ========================
+def run_search(games, depths=DEFAULT_DEPTHS):
+    """Run get_best_move at fixed depths; the node total is the signature"""
+    results = {}
+    total_nodes, total_time = 0, 0.0
+    for depth in depths:
+        nodes, elapsed, positions = 0, 0.0, {}
+        for name, game in games:
+            bot = ChessBot(game.to_move, depth, collect_stats=True)
+            start = time.perf_counter()
+            bot.get_best_move(game)
+            seconds = time.perf_counter() - start
+            stats = bot.last_stats
+            positions[name] = {"nodes": stats["nodes"], "time": seconds}
+            nodes += stats["nodes"]
+            elapsed += seconds
+        results[str(depth)] = {"nodes": nodes, "time": elapsed,
+                               "nps": nodes / elapsed if elapsed > 0 else 0.0,
+                               "positions": positions}
+        total_nodes += nodes
+        total_time += elapsed
+    return {"depths": results, "nodes": total_nodes, "time": total_time,
+            "nps": total_nodes / total_time if total_time > 0 else 0.0}
+
+def combine_runs(runs):
+    """Merge the time_micro results of several runs of one benchmark"""
+    medians = sorted(result["median_ns"] for result in runs)
+    median = medians[len(medians) // 2]
+    between = (medians[-1] - medians[0]) / medians[0] if medians[0] > 0 else 0.0
+    return {"ns_per_call": min(result["ns_per_call"] for result in runs), "median_ns": median,
+            "noise": max(between, max(result["noise"] for result in runs)),
+            "run_medians": medians, "calls": runs[0]["calls"]}
+
+def run_bench(depths=DEFAULT_DEPTHS, rounds=DEFAULT_ROUNDS, micro=None, progress=None, runs=DEFAULT_RUNS):
+    games = load_positions()
+    report = {
+        "version": BENCH_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "positions": [name for name, _ in POSITIONS],
+        "micro": {},
+    }
+    names = list(micro or MICRO_BENCHMARKS)
+    results = {name: [] for name in names}
+    for i in range(runs):
+        # Interleave the runs, so a slow spell of the machine shows up as noise
+        for name in names:
+            if progress:
+                progress(f"{name} (run {i + 1}/{runs})")
+            results[name].append(time_micro(name, games, rounds))
+    for name in names:
+        report["micro"][name] = combine_runs(results[name])
+    if depths:
+        if progress:
+            progress("search")
+        report["search"] = run_search(games, depths)
+        report["signature"] = report["search"]["nodes"]
+    return report
+
+# ========================
+# Baseline comparison
+# ========================
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare a report with a baseline report
+
+    Returns a list of (name, ratio, allowed, verdict) rows and whether any
+    benchmark regressed. A ratio above 1 means slower than the baseline.
+    """
+    rows, regressed = [], False
+    for name, current in report["micro"].items():
+        base = baseline.get("micro", {}).get(name)
+        if base is None:
+            continue
+        ratio = current["median_ns"] / base["median_ns"]
+        allowed = threshold + 2 * max(current["noise"], base["noise"])
+        verdict = "slower" if ratio > 1 + allowed else "faster" if ratio < 1 - allowed else "same"
+        regressed = regressed or verdict == "slower"
+        rows.append((name, ratio, allowed, verdict))
+
+    search, base_search = report.get("search"), baseline.get("search")
+    if search and base_search and search["depths"].keys() == base_search["depths"].keys():
+        # Nodes per second is the speed measure; the node counts may differ
+        ratio = base_search["nps"] / search["nps"] if search["nps"] else float("inf")
+        allowed = threshold + SEARCH_NOISE
+        verdict = "slower" if ratio > 1 + allowed else "faster" if ratio < 1 - allowed else "same"
+        regressed = regressed or verdict == "slower"
+        rows.append(("search_nps", ratio, allowed, verdict))
+    return rows, regressed
+
+def print_report(report):
+    print(f"Python {report['python']} ({report['machine']}), {len(report['positions'])} positions")
+    print(f"{'benchmark':<24}{'ns/call':>12}{'median':>12}{'noise':>8}")
+    for name, result in report["micro"].items():
+        print(f"{name:<24}{result['ns_per_call']:>12.0f}{result['median_ns']:>12.0f}{result['noise']:>8.1%}")
+    if "search" in report:
+        search = report["search"]
+        for depth, result in search["depths"].items():
+            print(f"search depth {depth}: {result['nodes']} nodes, {result['time']:.2f}s, {result['nps']:.0f} nps")
+        print(f"Signature: {report['signature']} nodes, {search['nps']:.0f} nps overall")
+
+def print_comparison(report, baseline, rows):
+    print("\nCompared with baseline (ratio > 1 is slower):")
+    for name, ratio, allowed, verdict in rows:
+        print(f"{name:<24}{ratio:>8.3f}  (+/-{allowed:.0%})  {verdict}")
+    if "signature" in report and "signature" in baseline:
+        if report["signature"] == baseline["signature"]:
+            print(f"Signature unchanged: {report['signature']} nodes")
+        else:
+            print(f"Signature changed: {baseline['signature']} -> {report['signature']} nodes "
+                  f"(the search behaves differently)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench", description="Benchmark the chess engine")
+    parser.add_argument("--depths", type=int, nargs="*", default=list(DEFAULT_DEPTHS),
+                        help="search depths to run (none to skip the search benchmark)")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="timing rounds per micro benchmark")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="runs of the whole micro suite")
+    parser.add_argument("--micro", nargs="*", choices=sorted(MICRO_BENCHMARKS), help="micro benchmarks to run (default: all)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown on top of the measured noise")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    def progress(name):
+        if not args.json:
+            print(f"Running {name}...", file=sys.stderr)
+
+    report = run_bench(args.depths, args.rounds, args.micro, progress, max(1, args.runs))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressed = compare(report, baseline, args.threshold)
+        report["comparison"] = [{"name": name, "ratio": ratio, "allowed": allowed, "verdict": verdict}
+                                for name, ratio, allowed, verdict in rows]
+        report["regressed"] = regressed
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        if args.baseline:
+            print_comparison(report, baseline, rows)
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""Asyncio JSON service hosting many concurrent chess games.
+
+Run with `python engine_service.py --port 8765`. Endpoints:
+
+POST   /games                      -> start a new game
+GET    /games/<id>                 -> game state
+GET    /games/<id>/legal_moves     -> legal moves per piece
+POST   /games/<id>/move            -> {"piece": "P5_W", "to": "E4", "promotion": "Q"}
+POST   /games/<id>/ai_move         -> {"depth": 3, "time_limit": 2.0} or {"level": 2}
+DELETE /games/<id>                 -> end a game
+
+AI searches run in a bounded process pool so the event loop never runs
+engine code. A search waits for a free process before its time limit
+starts. New searches get a 503 once the queued time limits amount to more
+than --max-queue-wait seconds per process. With --cache FILE the search processes share a persistent
+analysis cache (see analysis_cache.py). Rules work (move validation, legal moves) runs on a single
+helper thread. Game states include a "status" field: "ongoing",
+"checkmate", "stalemate", "fifty_move_rule", "insufficient_material" or
+"resignation".
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from example import ChessBot, ChessGame, SKILL_LEVELS, WHITE, BLACK, bot_for_level
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 5
+DEFAULT_TIME_LIMIT = 2.0
+MAX_TIME_LIMIT = 10.0
+TIMEOUT_GRACE = 1.0  # Extra seconds a worker gets to return after its deadline
+DEFAULT_MAX_QUEUE_WAIT = 30.0  # Expected seconds in the queue before new searches are rejected
+
+class ServiceError(Exception):
+    """Error reported to the client with an HTTP status"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# ========================
+# Worker process side
+# ========================
+_worker_bots = {}
+_worker_cache = None
+
+def _init_worker(cache_path):
+    """Open the shared analysis cache once per pool process"""
+    global _worker_cache
+    if cache_path:
+        from analysis_cache import AnalysisCache
+        _worker_cache = AnalysisCache(cache_path)
+
+def _search_worker(game, depth, time_limit, level=None):
+    """Run an AI search in a pool process, reusing the hash table per side and depth or level"""
+    key = (game.to_move, depth, level)
+    bot = _worker_bots.get(key)
+    if bot is None:
+        if level is not None:
+            bot = bot_for_level(game.to_move, level, cache=_worker_cache)
+        else:
+            bot = ChessBot(game.to_move, depth, cache=_worker_cache)
+        _worker_bots[key] = bot
+    return bot.get_best_move(game, time_limit=time_limit)
+
+# ========================
+# Sessions
+# ========================
+class GameSession:
+    def __init__(self, game_id):
+        self.id = game_id
+        self.game = ChessGame()
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+def _side_name(side):
+    return {WHITE: "white", BLACK: "black"}.get(side)
+
+def game_state(session):
+    """JSON state of a session's game; it runs engine code, so call it on the rules thread"""
+    game = session.game
+    return {
+        "game_id": session.id,
+        "to_move": _side_name(game.to_move),
+        "fullmove_number": game.game_state.fullmove_number,
+        "in_check": game.is_in_check(game.to_move),
+        "game_over": game.game_over,
+        "status": game.status,
+        "winner": _side_name(game.winner),
+        "pieces": {
+            pid: {"type": piece.ptype, "square": game.square_to_str(piece.x, piece.y)}
+            for pid, piece in game.pieces.items() if piece.alive
+        },
+    }
+
+def _legal_moves(game):
+    moves = {}
+    for pid, piece in list(game.pieces.items()):
+        if piece.alive and piece.side == game.to_move:
+            targets = game.legal_moves(piece)
+            if targets:
+                moves[pid] = [game.square_to_str(x, y) for x, y in targets]
+    return moves
+
+class EngineService:
+    def __init__(self, max_workers=None, max_pending=64, max_sessions=1000,
+                 idle_timeout=1800.0, cache_path=None, max_queue_wait=DEFAULT_MAX_QUEUE_WAIT):
+        self.sessions = {}
+        self.search_workers = max_workers or os.cpu_count() or 1
+        self.search_pool = ProcessPoolExecutor(max_workers=self.search_workers, initializer=_init_worker,
+                                               initargs=(cache_path,))
+        self.rules_pool = ThreadPoolExecutor(max_workers=1)
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_queue_wait = max_queue_wait
+        self.pending = 0
+        self.queued_seconds = 0.0  # Time limits of the searches waiting or running
+        self._search_slots = None  # One per search process, so a search only starts on a free one
+        self._evictor = None
+
+    def start(self):
+        self._evictor = asyncio.get_running_loop().create_task(self._evict_idle())
+
+    async def close(self):
+        if self._evictor:
+            self._evictor.cancel()
+        self.search_pool.shutdown(cancel_futures=True)
+        self.rules_pool.shutdown()
+
+    async def _evict_idle(self):
+        """Drop sessions that have not been used for idle_timeout seconds"""
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            cutoff = time.monotonic() - self.idle_timeout
+            for game_id, session in list(self.sessions.items()):
+                if session.last_used < cutoff and not session.lock.locked():
+                    del self.sessions[game_id]
+
+    def _session(self, game_id):
+        session = self.sessions.get(game_id)
+        if session is None:
+            raise ServiceError(404, f"Unknown game {game_id}")
+        session.touch()
+        return session
+
+    async def _rules(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.rules_pool, fn, *args)
+
+    async def new_game(self):
+        if len(self.sessions) >= self.max_sessions:
+            raise ServiceError(503, "Too many open games")
+        game_id = uuid.uuid4().hex
+        session = GameSession(game_id)
+        self.sessions[game_id] = session
+        return await self._rules(game_state, session)
+
+    async def get_game(self, game_id):
+        session = self._session(game_id)
+        async with session.lock:
+            return await self._rules(game_state, session)
+
+    async def end_game(self, game_id):
+        self._session(game_id)
+        del self.sessions[game_id]
+        return {"game_id": game_id, "deleted": True}
+
+    async def legal_moves(self, game_id):
+        session = self._session(game_id)
+        async with session.lock:
+            moves = await self._rules(_legal_moves, session.game)
+        return {"game_id": game_id, "moves": moves}
+
+    async def move(self, game_id, piece, to, promotion=None):
+        if not isinstance(piece, str) or not isinstance(to, str):
+            raise ServiceError(400, "Expected string fields 'piece' and 'to'")
+        if promotion is not None and not isinstance(promotion, str):
+            raise ServiceError(400, "Expected a string field 'promotion'")
+        session = self._session(game_id)
+        async with session.lock:
+            result = await self._rules(session.game.apply_move, (piece, to), promotion)
+            if not result.ok:
+                raise ServiceError(409, result.error)
+            return await self._rules(game_state, session)
+
+    async def ai_move(self, game_id, depth=DEFAULT_DEPTH, time_limit=DEFAULT_TIME_LIMIT, level=None):
+        try:
+            depth = min(max(int(depth), 1), MAX_DEPTH)
+            time_limit = float(time_limit)
+        except (TypeError, ValueError, OverflowError):
+            raise ServiceError(400, "Invalid depth or time_limit")
+        # json.loads accepts NaN and Infinity, which would never hit a deadline
+        if not math.isfinite(time_limit):
+            raise ServiceError(400, "Invalid depth or time_limit")
+        time_limit = min(max(time_limit, 0.01), MAX_TIME_LIMIT)
+        if level is not None:
+            if not isinstance(level, int) or isinstance(level, bool) or level not in SKILL_LEVELS:
+                raise ServiceError(400, f"Invalid level, expected one of {sorted(SKILL_LEVELS)}")
+            # The level's own budgets replace depth and time_limit
+            time_limit = min(SKILL_LEVELS[level]["time"], MAX_TIME_LIMIT)
+        session = self._session(game_id)
+        if self.pending >= self.max_pending:
+            raise ServiceError(503, "Search queue is full, retry later")
+        if self.queued_seconds / self.search_workers > self.max_queue_wait:
+            raise ServiceError(503, "Search queue is too long, retry later")
+
+        self.pending += 1
+        try:
+            async with session.lock:
+                return await self._ai_move(session, depth, time_limit, level)
+        finally:
+            self.pending -= 1
+
+    async def _ai_move(self, session, depth, time_limit, level=None):
+        if session.game.game_over:
+            raise ServiceError(409, "Game is over")
+        if self._search_slots is None:
+            self._search_slots = asyncio.Semaphore(self.search_workers)
+        loop = asyncio.get_running_loop()
+        self.queued_seconds += time_limit
+        try:
+            # Wait for a free search process first, so the timeout only
+            # covers the search and not the time spent in the queue
+            async with self._search_slots:
+                future = loop.run_in_executor(
+                    self.search_pool, _search_worker, session.game, depth, time_limit, level)
+                try:
+                    best_move = await asyncio.wait_for(future, time_limit + TIMEOUT_GRACE)
+                except asyncio.TimeoutError:
+                    raise ServiceError(504, "Search did not finish in time")
+        finally:
+            self.queued_seconds -= time_limit
+        if best_move is None:
+            raise ServiceError(409, "No legal moves")
+
+        result = await self._rules(session.game.apply_move, best_move)
+        if not result.ok:
+            raise ServiceError(500, f"Engine produced an illegal move: {result.error}")
+        session.touch()
+        state = await self._rules(game_state, session)
+        state["ai_move"] = {"piece": result.piece, "to": session.game.square_to_str(*result.target),
+                            "promotion": result.promotion}
+        return state
+
+    async def dispatch(self, method, path, body):
+        parts = [p for p in path.split("?")[0].split("/") if p]
+        if parts == ["games"] and method == "POST":
+            return 201, await self.new_game()
+        if len(parts) == 2 and parts[0] == "games":
+            if method == "GET":
+                return 200, await self.get_game(parts[1])
+            if method == "DELETE":
+                return 200, await self.end_game(parts[1])
+        if len(parts) == 3 and parts[0] == "games":
+            game_id, action = parts[1], parts[2]
+            if action == "legal_moves" and method == "GET":
+                return 200, await self.legal_moves(game_id)
+            if action == "move" and method == "POST":
+                return 200, await self.move(game_id, body.get("piece"), body.get("to"),
+                                            body.get("promotion"))
+            if action == "ai_move" and method == "POST":
+                return 200, await self.ai_move(game_id, body.get("depth", DEFAULT_DEPTH),
+                                               body.get("time_limit", DEFAULT_TIME_LIMIT),
+                                               body.get("level"))
+        raise ServiceError(404, f"No route for {method} {path}")
+
+# ========================
+# HTTP/JSON transport
+# ========================
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable", 504: "Gateway Timeout"}
+MAX_BODY = 64 * 1024
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise ServiceError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+def _write_response(writer, status, payload, keep_alive):
+    data = json.dumps(payload).encode()
+    head = [
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(data)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == 503:
+        head.append("Retry-After: 1")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, raw_body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                except ValueError:
+                    raise ServiceError(400, "Body is not valid JSON")
+                if not isinstance(body, dict):
+                    raise ServiceError(400, "Body must be a JSON object")
+                status, payload = await service.dispatch(method, path, body)
+            except ServiceError as e:
+                status, payload = e.status, {"error": e.message}
+            except (ValueError, asyncio.IncompleteReadError):
+                status, payload, keep_alive = 400, {"error": "Malformed request"}, False
+            _write_response(writer, status, payload, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(host="127.0.0.1", port=8765, **service_options):
+    service = EngineService(**service_options)
+    service.start()
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"Chess engine service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-game chess engine service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="search processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=64, help="queued AI searches before rejecting")
+    parser.add_argument("--max-queue-wait", type=float, default=DEFAULT_MAX_QUEUE_WAIT,
+                        help="expected seconds of queued searches before rejecting")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--idle-timeout", type=float, default=1800.0, help="seconds before an idle game is dropped")
+    parser.add_argument("--cache", help="SQLite analysis cache shared by the search processes")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, max_workers=args.workers,
+                          max_pending=args.max_pending, max_sessions=args.max_sessions,
+                          idle_timeout=args.idle_timeout, cache_path=args.cache,
+                          max_queue_wait=args.max_queue_wait))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import re
-import copy
+import select
+import sys
 import time
 import random
+import threading
 
 FILES = "ABCDEFGH"
 RANKS = "12345678"
@@ -55,6 +57,148 @@ KING_MIDDLEGAME_TABLE = [
     [ 20, 30, 10,  0,  0, 10, 30, 20]
 ]
 
+# Zobrist hashing keys (fixed seed so keys are stable between runs)
+_zobrist_rng = random.Random(0x0B0A4D)
+ZOBRIST_PIECES = {
+    (side, ptype): [[_zobrist_rng.getrandbits(64) for _ in range(8)] for _ in range(8)]
+    for side in (WHITE, BLACK) for ptype in PIECE_VALUES
+}
+ZOBRIST_CASTLING = {right: _zobrist_rng.getrandbits(64) for right in ("K_W", "Q_W", "K_B", "Q_B")}
+ZOBRIST_EP_FILE = [_zobrist_rng.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+
+# Material signature: 4-bit piece counts per side and type, kings left out
+MATERIAL_SHIFT = {(side, ptype): 4 * (i + 5 * s)
+                  for s, side in enumerate((WHITE, BLACK)) for i, ptype in enumerate("PNBRQ")}
+MATERIAL_UNIT = {key: 1 << shift for key, shift in MATERIAL_SHIFT.items()}
+MATERIAL_UNIT[(WHITE, "K")] = MATERIAL_UNIT[(BLACK, "K")] = 0
+
+def material_signature(white, black):
+    """Material key for the piece letters of each side, e.g. material_signature("KBN", "K")"""
+    return (sum(MATERIAL_UNIT[(WHITE, ptype)] for ptype in white)
+            + sum(MATERIAL_UNIT[(BLACK, ptype)] for ptype in black))
+
+# Dead draws: bare kings, a single minor piece, or two knights
+INSUFFICIENT_MATERIAL_KEYS = {material_signature(white, black) for white, black in (
+    ("K", "K"), ("KN", "K"), ("KB", "K"), ("K", "KN"), ("K", "KB"),
+    ("KNN", "K"), ("K", "KNN"), ("KN", "KN"))}
+
+# King and rook IDs that have to be unmoved for each castling right
+CASTLING_PIECES = {
+    "K_W": ("K_W", "R2_W"), "Q_W": ("K_W", "R1_W"),
+    "K_B": ("K_B", "R2_B"), "Q_B": ("K_B", "R1_B"),
+}
+
+# Transposition table
+TT_SIZE = 1 << 18
+TT_MASK = TT_SIZE - 1
+EXACT, LOWERBOUND, UPPERBOUND = 0, 1, 2
+
+# Packed moves: from square (6 bits) | to square (6 bits) | flags (4 bits),
+# with squares numbered y * 8 + x
+QUIET, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE = 0, 1, 2, 3
+CAPTURE, EP_CAPTURE = 4, 5
+PROMOTION = 8  # Low two flag bits select the piece from PROMOTION_PIECES
+PROMOTION_PIECES = "NBRQ"
+NO_MOVE = 0
+
+# Move generation stages
+GEN_CAPTURES = 1  # Captures and promotions
+GEN_QUIETS = 2
+GEN_ALL = GEN_CAPTURES | GEN_QUIETS
+
+MAX_PLY = 64
+MAX_MOVES = 256
+
+# Mate scores are MATE_SCORE minus the distance to mate in plies from the
+# root, so shorter mates score higher; anything beyond MATE_BOUND is a mate
+MATE_SCORE = 30000
+MATE_BOUND = MATE_SCORE - MAX_PLY
+
+KNIGHT_OFFSETS = ((2,1), (2,-1), (-2,1), (-2,-1), (1,2), (1,-2), (-1,2), (-1,-2))
+KING_OFFSETS = ((1,0), (-1,0), (0,1), (0,-1), (1,1), (1,-1), (-1,1), (-1,-1))
+SLIDER_DIRECTIONS = {
+    "R": ((1,0), (-1,0), (0,1), (0,-1)),
+    "B": ((1,1), (1,-1), (-1,1), (-1,-1)),
+    "Q": ((1,0), (-1,0), (0,1), (0,-1), (1,1), (1,-1), (-1,1), (-1,-1)),
+}
+
+def encode_move(frm, to, flags=QUIET):
+    return frm | (to << 6) | (flags << 12)
+
+def move_from(move):
+    return move & 63
+
+def move_to(move):
+    return (move >> 6) & 63
+
+def move_flags(move):
+    return move >> 12
+
+def move_promotion(move):
+    flags = move >> 12
+    return PROMOTION_PIECES[flags & 3] if flags & PROMOTION else None
+
+def score_to_tt(score, ply):
+    """Mate scores are stored relative to the node, so they stay valid at any ply"""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+def format_score(score):
+    """Centipawns as "+35", mates as "M3" or "-M3" in moves"""
+    if score is None:
+        return "?"
+    if abs(score) >= MATE_BOUND:
+        moves = (MATE_SCORE - abs(score) + 1) // 2
+        return f"M{moves}" if score > 0 else f"-M{moves}"
+    return f"{score:+.0f}"
+
+class MoveList:
+    """Reusable buffer of packed moves with their ordering scores"""
+    __slots__ = ("moves", "scores", "count")
+
+    def __init__(self):
+        self.moves = [0] * MAX_MOVES
+        self.scores = [0] * MAX_MOVES
+        self.count = 0
+
+    def __iter__(self):
+        return iter(self.moves[:self.count])
+
+    def pick(self, i):
+        """Swap the best-scored move of moves[i:] into slot i and return it"""
+        moves, scores = self.moves, self.scores
+        best = i
+        best_score = scores[i]
+        for j in range(i + 1, self.count):
+            if scores[j] > best_score:
+                best, best_score = j, scores[j]
+        if best != i:
+            moves[i], moves[best] = moves[best], moves[i]
+            scores[i], scores[best] = scores[best], scores[i]
+        return moves[i]
+
+class SearchAborted(Exception):
+    """Raised inside the search when it has been asked to stop"""
+
+# Game status
+ONGOING = "ongoing"
+CHECKMATE = "checkmate"
+STALEMATE = "stalemate"
+FIFTY_MOVE_RULE = "fifty_move_rule"
+INSUFFICIENT_MATERIAL = "insufficient_material"
+RESIGNATION = "resignation"
+
 class Piece:
     def __init__(self, pid, ptype, side, x, y):
         self.id = pid      
@@ -81,118 +225,731 @@ class GameState:
         self.fullmove_number = 1
         self.move_history = []  
 
+    def copy(self):
+        new_state = GameState()
+        new_state.castling_rights = dict(self.castling_rights)
+        new_state.en_passant_target = self.en_passant_target
+        new_state.halfmove_clock = self.halfmove_clock
+        new_state.fullmove_number = self.fullmove_number
+        new_state.move_history = list(self.move_history)
+        return new_state
+
+class MoveResult:
+    """Outcome of ChessGame.apply_move"""
+    def __init__(self, ok, error=None, move=NO_MOVE, piece=None, target=None, promotion=None,
+                 captured=None, check=False, status=ONGOING, winner=None, needs_promotion=False):
+        self.ok = ok
+        self.error = error              # Why the move was rejected
+        self.needs_promotion = needs_promotion
+        self.move = move                # Packed move
+        self.piece = piece              # Piece ID
+        self.target = target            # (x, y)
+        self.promotion = promotion
+        self.captured = captured        # Piece ID
+        self.check = check              # The side to move is in check after the move
+        self.status = status
+        self.winner = winner
+
+    def as_dict(self):
+        if not self.ok:
+            return {"ok": False, "error": self.error, "needs_promotion": self.needs_promotion}
+        return {
+            "ok": True,
+            "piece": self.piece,
+            "to": f"{FILES[self.target[0]]}{RANKS[self.target[1]]}",
+            "promotion": self.promotion,
+            "captured": self.captured,
+            "check": self.check,
+            "status": self.status,
+            "winner": {WHITE: "white", BLACK: "black"}.get(self.winner),
+        }
+
+class SearchStats:
+    """Counters the search fills in when statistics are enabled"""
+    def __init__(self):
+        self.start_time = time.time()
+        self.elapsed = 0.0
+        self.depth = 0
+        self.nodes = 0
+        self.interior_nodes = 0  # Nodes that searched at least one move
+        self.pawn_probes = 0
+        self.pawn_hits = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_stores = 0
+        self.legal_move_calls = 0
+        self.evaluate_calls = 0
+        self.cache_hit = False
+        self.iterations = []
+
+    def end_iteration(self, depth):
+        elapsed = time.time() - self.start_time
+        self.depth = depth
+        self.iterations.append({"depth": depth, "time": elapsed, "nodes": self.nodes})
+
+    def as_dict(self):
+        """Structured summary of the search"""
+        self.elapsed = time.time() - self.start_time
+        return {
+            "depth": self.depth,
+            "time": self.elapsed,
+            "nodes": self.nodes,
+            "nps": self.nodes / self.elapsed if self.elapsed > 0 else 0.0,
+            "beta_cutoffs": self.beta_cutoffs,
+            "cutoff_rate": self.beta_cutoffs / self.interior_nodes if self.interior_nodes else 0.0,
+            "first_move_cutoff_rate": self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            "tt_stores": self.tt_stores,
+            "pawn_probes": self.pawn_probes,
+            "pawn_hits": self.pawn_hits,
+            "pawn_hit_rate": self.pawn_hits / self.pawn_probes if self.pawn_probes else 0.0,
+            "legal_move_calls": self.legal_move_calls,
+            "evaluate_calls": self.evaluate_calls,
+            "cache_hit": self.cache_hit,
+            "iterations": self.iterations,
+        }
+
+# ========================
+# Pawn structure
+# ========================
+DOUBLED_PAWN_PENALTY = 15  # Per extra pawn on a file
+ISOLATED_PAWN_PENALTY = 15
+BACKWARD_PAWN_PENALTY = 10
+PASSED_PAWN_BONUS = [0, 10, 15, 25, 40, 65, 100, 0]  # By rank, from the pawn's own side
+PAWN_HASH_SIZE = 1 << 14
+PAWN_HASH_MASK = PAWN_HASH_SIZE - 1
+
+def evaluate_pawns(game):
+    """Doubled, isolated, backward and passed pawn terms from White's point of view
+    
+    The result depends on the pawns alone, so it can be cached by game.pawn_key.
+    """
+    ranks = {WHITE: [[] for _ in range(8)], BLACK: [[] for _ in range(8)]}
+    for piece in game.pieces.values():
+        if piece.alive and piece.ptype == "P":
+            ranks[piece.side][piece.x].append(piece.y)
+            
+    score = 0
+    for side, enemy, sign in ((WHITE, BLACK, 1), (BLACK, WHITE, -1)):
+        own, theirs = ranks[side], ranks[enemy]
+        for x in range(8):
+            if not own[x]:
+                continue
+            score -= sign * DOUBLED_PAWN_PENALTY * (len(own[x]) - 1)
+            neighbours = [y for f in (x - 1, x + 1) if 0 <= f < 8 for y in own[f]]
+            for y in own[x]:
+                ahead = (lambda other: other > y) if side == WHITE else (lambda other: other < y)
+                if not neighbours:
+                    score -= sign * ISOLATED_PAWN_PENALTY
+                elif all(ahead(other) for other in neighbours):
+                    # No neighbour can support it, and an enemy pawn guards the square in front
+                    stop_guard = y + 2 * sign
+                    if any(stop_guard in theirs[f] for f in (x - 1, x + 1) if 0 <= f < 8):
+                        score -= sign * BACKWARD_PAWN_PENALTY
+                if (not any(ahead(other) for other in own[x])
+                        and not any(ahead(other) for f in (x - 1, x, x + 1) if 0 <= f < 8 for other in theirs[f])):
+                    score += sign * PASSED_PAWN_BONUS[y if side == WHITE else 7 - y]
+    return score
+
+# ========================
+# Endgame knowledge
+# ========================
+SCALE_NORMAL = 64  # Scale factor that leaves the evaluation unchanged
+KNOWN_WIN = 5000
+
+# Distance of each square from the centre, used to drive a king to the edge
+PUSH_TO_EDGE = [[max(abs(2 * x - 7), abs(2 * y - 7)) // 2 for y in range(8)] for x in range(8)]
+
+def king_distance(a, b):
+    return max(abs(a.x - b.x), abs(a.y - b.y))
+
+def pieces_of(game, side, ptype):
+    return [p for p in game.pieces.values() if p.alive and p.side == side and p.ptype == ptype]
+
+def evaluate_kxk(game, strong):
+    """King and major piece(s) against a lone king: drive the king to the edge"""
+    weak = BLACK if strong == WHITE else WHITE
+    king, weak_king = game.pieces[f"K{strong}"], game.pieces[f"K{weak}"]
+    material = game.material[strong] - PIECE_VALUES["K"]
+    return (KNOWN_WIN + material + 40 * PUSH_TO_EDGE[weak_king.x][weak_king.y]
+            + 10 * (7 - king_distance(king, weak_king)))
+
+def evaluate_kbnk(game, strong):
+    """King, bishop and knight against a lone king: mate in a corner of the bishop's colour"""
+    weak = BLACK if strong == WHITE else WHITE
+    king, weak_king = game.pieces[f"K{strong}"], game.pieces[f"K{weak}"]
+    bishop = pieces_of(game, strong, "B")[0]
+    # a1 and h8 are dark squares, a8 and h1 light ones
+    corners = ((0, 0), (7, 7)) if (bishop.x + bishop.y) % 2 == 0 else ((0, 7), (7, 0))
+    corner_distance = min(max(abs(weak_king.x - cx), abs(weak_king.y - cy)) for cx, cy in corners)
+    return (KNOWN_WIN + PIECE_VALUES["B"] + PIECE_VALUES["N"] + 20 * PUSH_TO_EDGE[weak_king.x][weak_king.y]
+            + 40 * (7 - corner_distance) + 10 * (7 - king_distance(king, weak_king)))
+
+def evaluate_krkb(game, strong):
+    """Rook against bishop is a draw in general, with small chances when the king is on the edge"""
+    weak = BLACK if strong == WHITE else WHITE
+    weak_king = game.pieces[f"K{weak}"]
+    return 10 * PUSH_TO_EDGE[weak_king.x][weak_king.y]
+
+def scale_wrong_rook_pawn(game, strong):
+    """Bishop and rook pawns with the wrong bishop draw if the defending king holds the corner"""
+    weak = BLACK if strong == WHITE else WHITE
+    pawns = pieces_of(game, strong, "P")
+    files = {p.x for p in pawns}
+    if len(files) != 1 or files.pop() not in (0, 7):
+        return SCALE_NORMAL
+    bishop = pieces_of(game, strong, "B")[0]
+    queening = (pawns[0].x, 7 if strong == WHITE else 0)
+    if (bishop.x + bishop.y) % 2 == sum(queening) % 2:
+        return SCALE_NORMAL  # The bishop controls the queening square
+    weak_king = game.pieces[f"K{weak}"]
+    if max(abs(weak_king.x - queening[0]), abs(weak_king.y - queening[1])) <= 1:
+        return 0
+    return SCALE_NORMAL
+
+def scale_opposite_bishops(game, strong):
+    """Bishops of opposite colours with only pawns left are very drawish"""
+    white_bishop, black_bishop = pieces_of(game, WHITE, "B")[0], pieces_of(game, BLACK, "B")[0]
+    if (white_bishop.x + white_bishop.y) % 2 == (black_bishop.x + black_bishop.y) % 2:
+        return SCALE_NORMAL
+    pawn_difference = abs(len(pieces_of(game, WHITE, "P")) - len(pieces_of(game, BLACK, "P")))
+    return 16 if pawn_difference <= 1 else 32
+
+# Material signature -> (function, kind, strong side). Evaluation functions
+# return the score from the strong side's view; scaling functions return a
+# factor out of SCALE_NORMAL for the normal evaluation.
+ENDGAMES = {}
+
+def _register(strong_pieces, weak_pieces, function, kind):
+    ENDGAMES[material_signature(strong_pieces, weak_pieces)] = (function, kind, WHITE)
+    ENDGAMES[material_signature(weak_pieces, strong_pieces)] = (function, kind, BLACK)
+
+_register("KQ", "K", evaluate_kxk, "eval")
+_register("KR", "K", evaluate_kxk, "eval")
+_register("KQR", "K", evaluate_kxk, "eval")
+_register("KRR", "K", evaluate_kxk, "eval")
+_register("KQQ", "K", evaluate_kxk, "eval")
+_register("KBN", "K", evaluate_kbnk, "eval")
+_register("KR", "KB", evaluate_krkb, "eval")
+for _pawns in range(1, 4):
+    _register("KB" + "P" * _pawns, "K", scale_wrong_rook_pawn, "scale")
+for _white_pawns in range(9):
+    for _black_pawns in range(9):
+        ENDGAMES[material_signature("KB" + "P" * _white_pawns, "KB" + "P" * _black_pawns)] = (
+            scale_opposite_bishops, "scale", None)
+
+# ========================
+# Difficulty levels
+# ========================
+# Each level caps the search depth, nodes and seconds per move, whichever
+# runs out first. Weaker levels search several root moves (MultiPV) and
+# play a random one of those within `margin` centipawns of the best.
+# Every MultiPV line costs a search, so the node and time budgets leave
+# room for each level to finish at least depth 2; a pick from depth 1
+# can hang a piece to a one-move reply.
+SKILL_LEVELS = {
+    1: {"name": "Easy", "depth": 2, "nodes": 1000, "time": 1.5, "lines": 3, "margin": 150},
+    2: {"name": "Medium", "depth": 3, "nodes": 2500, "time": 3.0, "lines": 2, "margin": 50},
+    3: {"name": "Hard", "depth": 5, "nodes": 5000, "time": 6.0, "lines": 2, "margin": 15},
+    4: {"name": "Expert", "depth": 6, "nodes": 20000, "time": 15.0, "lines": 1, "margin": 0},
+}
+
+def bot_for_level(side, level, seed=None, **options):
+    """ChessBot playing at one of the SKILL_LEVELS"""
+    skill = SKILL_LEVELS[level]
+    bot = ChessBot(side, skill["depth"], node_limit=skill["nodes"], move_time=skill["time"],
+                   random_lines=skill["lines"], random_margin=skill["margin"], seed=seed, **options)
+    bot.level = level
+    return bot
+
 class ChessBot:
-    def __init__(self, side, difficulty=3):
+    def __init__(self, side, difficulty=3, ponder=False, collect_stats=False, cache=None,
+                 node_limit=None, move_time=None, random_lines=1, random_margin=0, seed=None):
         self.side = side
         self.difficulty = difficulty  # Search depth
+        self.level = None  # Key of SKILL_LEVELS when built by bot_for_level()
         self.name = "ChessBot AI"
+        self.ponder = ponder  # Search the expected reply while the opponent thinks
+        self.node_limit = node_limit  # Nodes per search, None for no limit
+        self.move_time = move_time  # Seconds per search, None for no limit
+        self.random_lines = random_lines  # Root moves to pick from when randomising
+        self.random_margin = random_margin  # Centipawns from the best a random pick may lose
+        self.rng = random.Random(seed)
+        self.nodes = 0  # Nodes of the running or last search
+        self.tt = [None] * TT_SIZE  # Entries: (key, depth, score, flag, best_move)
+        self.pawn_hash = [None] * PAWN_HASH_SIZE  # Entries: (pawn key, evaluate_pawns score)
+        self.pv = []
+        self.lines = []  # (move, score, pv) per line of the last search
+        self.move_lists = [MoveList() for _ in range(MAX_PLY + 1)]
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_PLY + 1)]
+        self.collect_stats = collect_stats
+        self.stats = None  # SearchStats of the running search, None when disabled
+        self.last_stats = None  # Summary dict of the last finished search
+        self.cache = cache  # Optional AnalysisCache shared with other bots and processes
+        self.ponder_hit = False  # Whether the last search took over the ponder search
+        self.progress = None  # (depth, move, score) of the running search, updated as it improves
+        self._stop = threading.Event()
+        self._deadline = None
+        self._node_limit = None
+        self._root_best = None  # Best (move, score) of the unfinished root iteration
+        self._first_score = None  # Score of analyse_move()'s move at the last finished depth
+        # Background search, thinking on our move or pondering on the opponent's
+        self._thread = None
+        self._thread_stop = None
+        self._thread_result = None
+        self._ponder_move = None  # Expected reply while the background search ponders
+        self._ponder_ply = None
         
-    def think_and_move(self, game):
-        """AI makes a move using minimax with alpha-beta pruning"""
-        print(f"\n{self.name}: Let me think...")
-        start_time = time.time()
-        
-        best_move = self.get_best_move(game)
+    def choose_move(self, game, time_limit=None):
+        """Best move for the side to move, reusing the ponder search on a ponder hit"""
+        self.start_thinking(game, time_limit)
+        return self.finish_thinking(game)
         
-        think_time = time.time() - start_time
-        print(f"{self.name}: I'll move {best_move[0]} to {game.square_to_str(*best_move[1])} (thought for {think_time:.1f}s)")
+    def reply(self, game, time_limit=None):
+        """Choose and play a move, then start pondering; returns the MoveResult"""
+        best_move = self.choose_move(game, time_limit)
+        if best_move is None:
+            return MoveResult(False, "No legal moves.")
+        result = game.apply_move(best_move)
+        self.start_pondering(game)
+        return result
         
-        # Execute the move
-        piece = game.pieces[best_move[0]]
-        game.move(best_move[0], game.square_to_str(*best_move[1]))
+    def get_best_move(self, game, stop=None, time_limit=None):
+        """Find the best move using iterative deepening minimax with alpha-beta pruning
         
-    def get_best_move(self, game):
-        """Find the best move using minimax with alpha-beta pruning"""
-        best_move = None
-        best_score = float('-inf') if self.side == game.to_move else float('inf')
+        Returns a packed move (see ChessGame.decode), or None without legal
+        moves. The search can be cut short by setting `stop`, after
+        `time_limit` seconds or by the bot's node_limit and move_time, in
+        which case the best move of the last finished iteration is
+        returned.
+        """
+        best_move, self.last_stats = self._play_search(game, stop, time_limit)
+        return best_move
+    
+    def get_top_moves(self, game, count, stop=None, time_limit=None):
+        """Find the best `count` moves (MultiPV)
         
-        all_moves = []
-        for pid, piece in game.pieces.items():
-            if piece.alive and piece.side == self.side:
-                moves = game.legal_moves(piece)
-                for move in moves:
-                    all_moves.append((pid, move))
+        Returns a list of (move, score, pv) tuples, best first, with scores
+        from this bot's point of view. Each pass at a depth searches the
+        root moves not found yet; all passes share the hash table and the
+        root move order.
+        """
+        _, self.last_stats = self._search(game, stop, time_limit, count)
+        return self.lines
+
+    def analyse_move(self, game, move, stop=None, time_limit=None):
+        """Find the best move and score `move` in the same search
+
+        Every iteration searches `move` on its own with a full window before
+        the root moves, so it gets an exact score from the same hash table
+        and depth as the best move.
+
+        Returns (best move, its score, score of `move`) from this bot's
+        point of view; the scores are None when no iteration finished.
+        """
+        best_move, self.last_stats = self._search(game, stop, time_limit, first_move=move)
+        if best_move is None:
+            return None, None, None
+        return best_move, self.lines[0][1], self._first_score
+    
+    def _play_search(self, game, stop, time_limit):
+        """Search for the move to play, picking among near-best moves when randomising"""
+        if self.random_lines <= 1 or self.random_margin <= 0:
+            return self._search(game, stop, time_limit)
+        best_move, stats = self._search(game, stop, time_limit, self.random_lines)
+        if not self.lines or self.lines[0][1] is None:
+            return best_move, stats
+        best_score = self.lines[0][1]
+        candidates = [line for line in self.lines if line[1] is not None and line[1] >= best_score - self.random_margin]
+        move, score, pv = self.rng.choice(candidates)
+        self.lines = [(move, score, pv)] + [line for line in self.lines if line[0] != move]
+        self.pv = pv
+        return move, stats
+    
+    def _search(self, game, stop, time_limit, multi_pv=1, first_move=None):
+        if self.move_time is not None:
+            time_limit = self.move_time if time_limit is None else min(time_limit, self.move_time)
+        self._stop = stop if stop is not None else threading.Event()
+        self._deadline = time.time() + time_limit if time_limit is not None else None
+        self._node_limit = self.node_limit
+        self.nodes = 0
+        self.progress = None
+        self._first_score = None
+        self.stats = stats = SearchStats() if self.collect_stats else None
+        # The search makes and unmakes moves on a private copy, so an aborted
+        # search can't leave the caller's game half-changed
+        board = game.copy()
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_PLY + 1)]
         
         # Order moves for better alpha-beta pruning
-        all_moves = self.order_moves(game, all_moves)
+        move_list = self.move_lists[0]
+        if stats:
+            stats.legal_move_calls += 1
+        board.generate_moves(move_list)
+        self.score_moves(board, move_list)
+        all_moves = []
+        for i in range(move_list.count):
+            move = move_list.pick(i)
+            if board.is_legal(move):
+                all_moves.append(move)
+        if not all_moves:
+            self.pv = []
+            self.lines = []
+            self.stats = None
+            return None, stats.as_dict() if stats else None
+            
+        if first_move not in all_moves:
+            first_move = None
+            
+        # A finished search of this position in the analysis cache replaces the search
+        key = game.position_key()
+        if self.cache is not None and multi_pv == 1 and first_move is None:
+            hit = self.cache.probe(key, self.difficulty, self.side)
+            if hit is not None and hit[0] in all_moves:
+                best_move, score, pv = hit
+                self.pv = pv if pv and pv[0] == best_move else [best_move]
+                self.lines = [(best_move, score, self.pv)]
+                if stats:
+                    stats.cache_hit = True
+                    stats.depth = self.difficulty
+                self.stats = None
+                return best_move, stats.as_dict() if stats else None
         
+        found = []
+        completed_depth = 0
+        try:
+            for depth in range(1, self.difficulty + 1):
+                if first_move is not None:
+                    # Scored alone first; the root search then finds its subtree in the hash table
+                    first_score = self.search_root(board, [first_move], depth, store=False)[1]
+                lines = []
+                remaining = list(all_moves)
+                for _ in range(min(multi_pv, len(all_moves))):
+                    # Later passes exclude the moves already found at this depth
+                    move, score = self.search_root(board, remaining, depth, store=not lines)
+                    lines.append((move, score))
+                    remaining.remove(move)
+                found = lines
+                completed_depth = depth
+                if first_move is not None:
+                    self._first_score = first_score
+                self.progress = (depth,) + found[0]
+                if stats:
+                    stats.end_iteration(depth)
+                # Search the previous best moves first in the next iteration
+                all_moves = [move for move, _ in found] + remaining
+        except SearchAborted:
+            # The unfinished iteration searched the previous best move first,
+            # so a move that has beaten it is the better choice
+            if multi_pv == 1 and self._root_best is not None:
+                found = [self._root_best]
+            
+        if not found:
+            found = [(all_moves[0], None)]
+        best_move = found[0][0]
+        self.pv = self.extract_pv(game, self.difficulty)
+        if not self.pv or self.pv[0] != best_move:
+            self.pv = [best_move]
+        self.lines = [(best_move, found[0][1], self.pv)]
+        for move, score in found[1:]:
+            after = game.copy()
+            after.make_move(move)
+            self.lines.append((move, score, [move] + self.extract_pv(after, self.difficulty - 1)))
+        if self.cache is not None and completed_depth:
+            self.cache.store(key, completed_depth, self.side, best_move, found[0][1], self.pv)
+        self.stats = None
+        return best_move, stats.as_dict() if stats else None
+    
+    def search_root(self, game, moves, depth, store=True):
+        """Search the given root moves to a depth and return the best one with its score"""
+        maximizing = game.to_move == self.side
+        best_move = None
+        best_score = float('-inf') if maximizing else float('inf')
         alpha = float('-inf')
         beta = float('inf')
+        self._root_best = None
+        if self.stats:
+            self.stats.nodes += 1
+            self.stats.interior_nodes += 1
         
-        for pid, move in all_moves:
-            # Make a copy and try the move
-            game_copy = self.copy_game(game)
-            piece_copy = game_copy.pieces[pid]
+        for move in moves:
+            undo = game.make_move(move)
+            score = self.minimax(game, depth - 1, alpha, beta, not maximizing, 1)
+            game.unmake_move(move, undo)
             
-            # Execute move on copy
-            success = self.execute_move_on_copy(game_copy, piece_copy, move)
-            if not success:
-                continue
-                
-            game_copy.to_move = BLACK if game_copy.to_move == WHITE else WHITE
-            
-            score = self.minimax(game_copy, self.difficulty - 1, alpha, beta, 
-                                self.side != game_copy.to_move)
-            
-            if self.side == game.to_move:  # Maximizing
-                if score > best_score:
-                    best_score = score
-                    best_move = (pid, move)
+            if best_move is None or (score > best_score if maximizing else score < best_score):
+                best_score = score
+                best_move = move
+                self._root_best = (move, score)
+                if store:
+                    # Only the first MultiPV pass, which stores, sees all moves
+                    self.progress = (depth, move, score)
+            if maximizing:
                 alpha = max(alpha, score)
-            else:  # Minimizing
-                if score < best_score:
-                    best_score = score
-                    best_move = (pid, move)
+            else:
                 beta = min(beta, score)
                 
-            if beta <= alpha:
-                break
-                
-        return best_move if best_move else (all_moves[0] if all_moves else None)
+        if store:
+            key = game.position_key()
+            self.tt[key & TT_MASK] = (key, depth, best_score, EXACT, best_move)
+            if self.stats:
+                self.stats.tt_stores += 1
+        return best_move, best_score
     
-    def minimax(self, game, depth, alpha, beta, maximizing):
-        """Minimax algorithm with alpha-beta pruning"""
-        if depth == 0 or game.game_over:
+    def minimax(self, game, depth, alpha, beta, maximizing, ply):
+        """Minimax algorithm with alpha-beta pruning and a transposition table
+        
+        Mate and stalemate are found from the moves searched at each node:
+        no legal move is mate when in check and a draw otherwise.
+        """
+        if self._stop.is_set() or (self._deadline is not None and time.time() >= self._deadline):
+            raise SearchAborted()
+        self.nodes += 1
+        if self._node_limit is not None and self.nodes > self._node_limit:
+            raise SearchAborted()
+        stats = self.stats
+        if stats:
+            stats.nodes += 1
+        if game.material_key in INSUFFICIENT_MATERIAL_KEYS:
+            return 0  # Dead draw, nothing to search
+        if depth == 0 or ply >= MAX_PLY:
+            if stats:
+                stats.evaluate_calls += 1
             return self.evaluate_position(game)
             
+        # Mate distance pruning: no line from here beats mating on the next
+        # move or loses faster than being mated right now
         if maximizing:
-            max_eval = float('-inf')
-            for pid, piece in game.pieces.items():
-                if piece.alive and piece.side == game.to_move:
-                    moves = game.legal_moves(piece)
-                    for move in moves:
-                        game_copy = self.copy_game(game)
-                        piece_copy = game_copy.pieces[pid]
-                        
-                        if self.execute_move_on_copy(game_copy, piece_copy, move):
-                            game_copy.to_move = BLACK if game_copy.to_move == WHITE else WHITE
-                            eval_score = self.minimax(game_copy, depth - 1, alpha, beta, False)
-                            max_eval = max(max_eval, eval_score)
-                            alpha = max(alpha, eval_score)
-                            if beta <= alpha:
-                                break
-                    if beta <= alpha:
-                        break
-            return max_eval
+            alpha = max(alpha, ply - MATE_SCORE)
+            beta = min(beta, MATE_SCORE - ply - 1)
+            if alpha >= beta:
+                return alpha
         else:
-            min_eval = float('inf')
-            for pid, piece in game.pieces.items():
-                if piece.alive and piece.side == game.to_move:
-                    moves = game.legal_moves(piece)
-                    for move in moves:
-                        game_copy = self.copy_game(game)
-                        piece_copy = game_copy.pieces[pid]
-                        
-                        if self.execute_move_on_copy(game_copy, piece_copy, move):
-                            game_copy.to_move = BLACK if game_copy.to_move == WHITE else WHITE
-                            eval_score = self.minimax(game_copy, depth - 1, alpha, beta, True)
-                            min_eval = min(min_eval, eval_score)
-                            beta = min(beta, eval_score)
-                            if beta <= alpha:
-                                break
-                    if beta <= alpha:
-                        break
-            return min_eval
+            alpha = max(alpha, ply + 1 - MATE_SCORE)
+            beta = min(beta, MATE_SCORE - ply)
+            if alpha >= beta:
+                return beta
+            
+        key = game.position_key()
+        entry = self.tt[key & TT_MASK]
+        tt_move = NO_MOVE
+        if stats:
+            stats.tt_probes += 1
+        if entry is not None and entry[0] == key:
+            if stats:
+                stats.tt_hits += 1
+            _, entry_depth, entry_score, entry_flag, tt_move = entry
+            entry_score = score_from_tt(entry_score, ply)
+            if entry_depth >= depth:
+                if entry_flag == EXACT:
+                    return entry_score
+                if entry_flag == LOWERBOUND and entry_score >= beta:
+                    return entry_score
+                if entry_flag == UPPERBOUND and entry_score <= alpha:
+                    return entry_score
+                    
+        alpha_orig, beta_orig = alpha, beta
+        side = game.to_move
+        best_eval = float('-inf') if maximizing else float('inf')
+        best_move = NO_MOVE
+        searched = 0
+        for move in self.pick_moves(game, ply, tt_move):
+            undo = game.make_move(move)
+            if game.is_in_check(side):
+                game.unmake_move(move, undo)
+                continue
+            searched += 1
+            eval_score = self.minimax(game, depth - 1, alpha, beta, not maximizing, ply + 1)
+            game.unmake_move(move, undo)
+            
+            if maximizing:
+                if best_move == NO_MOVE or eval_score > best_eval:
+                    best_eval, best_move = eval_score, move
+                alpha = max(alpha, eval_score)
+            else:
+                if best_move == NO_MOVE or eval_score < best_eval:
+                    best_eval, best_move = eval_score, move
+                beta = min(beta, eval_score)
+            if beta <= alpha:
+                # Remember quiet moves that cause a cutoff as killers for this ply
+                if not move >> 12 & (CAPTURE | PROMOTION):
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                if stats:
+                    stats.beta_cutoffs += 1
+                    if searched == 1:
+                        stats.first_move_cutoffs += 1
+                break
+                
+        if not searched:
+            # No legal move: mate or stalemate
+            if not game.is_in_check(side):
+                return 0
+            return ply - MATE_SCORE if maximizing else MATE_SCORE - ply
+        if stats:
+            stats.interior_nodes += 1
+        if best_eval <= alpha_orig:
+            flag = UPPERBOUND
+        elif best_eval >= beta_orig:
+            flag = LOWERBOUND
+        else:
+            flag = EXACT
+        self.tt[key & TT_MASK] = (key, depth, score_to_tt(best_eval, ply), flag, best_move)
+        if stats:
+            stats.tt_stores += 1
+        return best_eval
+    
+    def pick_moves(self, game, ply, tt_move):
+        """Yield pseudo-legal moves in stages: hash move, captures, killers, quiet moves
+        
+        A stage is only generated once the previous one is used up, so a
+        cutoff on the hash move or a capture never generates quiet moves.
+        Legality is left to the caller, which checks each move when making it.
+        """
+        stats = self.stats
+        if tt_move != NO_MOVE and game.is_pseudo_legal(tt_move):
+            yield tt_move
+            
+        # Captures and promotions, most valuable victim first
+        move_list = self.move_lists[ply]
+        if stats:
+            stats.legal_move_calls += 1
+        game.generate_moves(move_list, GEN_CAPTURES)
+        self.score_captures(game, move_list)
+        for i in range(move_list.count):
+            move = move_list.pick(i)
+            if move != tt_move:
+                yield move
+                
+        killers = self.killers[ply]
+        for killer in list(killers):
+            if killer != NO_MOVE and killer != tt_move and game.is_pseudo_legal(killer):
+                yield killer
+                
+        if stats:
+            stats.legal_move_calls += 1
+        game.generate_moves(move_list, GEN_QUIETS)
+        self.score_moves(game, move_list)
+        for i in range(move_list.count):
+            move = move_list.pick(i)
+            if move != tt_move and move != killers[0] and move != killers[1]:
+                yield move
+    
+    def extract_pv(self, game, max_length):
+        """Follow the best moves stored in the transposition table"""
+        pv = []
+        game = game.copy()
+        move_list = MoveList()
+        seen = set()
+        while len(pv) < max_length:
+            key = game.position_key()
+            if key in seen:
+                break
+            seen.add(key)
+            entry = self.tt[key & TT_MASK]
+            if entry is None or entry[0] != key or entry[4] == NO_MOVE:
+                break
+            move = entry[4]
+            game.generate_moves(move_list)
+            if move not in move_list or not game.is_legal(move):
+                break
+            pv.append(move)
+            game.make_move(move)
+        return pv
+    
+    def start_thinking(self, game, time_limit=None):
+        """Start searching the position in a background thread
+        
+        The best move so far is published in self.progress as the search
+        improves. stop_thinking() or the time limit end the search early,
+        finish_thinking() waits for it and returns the move. On a ponder
+        hit the running ponder search is taken over instead.
+        """
+        if self._is_ponder_hit(game):
+            self.ponder_hit = True
+            self._ponder_move = None
+            if time_limit is not None:
+                # The ponder search has no deadline, or only its own move_time one
+                deadline = time.time() + time_limit
+                if self._deadline is None or deadline < self._deadline:
+                    self._deadline = deadline
+            return
+        self.ponder_hit = False
+        self.stop_pondering()
+        self._start_background(game.copy(), time_limit)
+        
+    def is_thinking(self):
+        return self._thread is not None and self._thread.is_alive()
+        
+    def stop_thinking(self):
+        """Make the running search return its best move so far"""
+        if self._thread is not None:
+            self._thread_stop.set()
+            
+    def finish_thinking(self, game):
+        """Wait for the search started by start_thinking() and return its move"""
+        self._thread.join()
+        best_move, self.last_stats = self._thread_result
+        self._thread = None
+        self._thread_result = None
+        if best_move is None:
+            return None
+        move_list = MoveList()
+        game.generate_moves(move_list)
+        if best_move not in move_list or not game.is_legal(best_move):
+            return None
+        return best_move
+        
+    def _start_background(self, game, time_limit):
+        self._thread_stop = threading.Event()
+        self._thread_result = None
+        self._thread = threading.Thread(
+            target=self._background_search, args=(game, self._thread_stop, time_limit), daemon=True)
+        self._thread.start()
+        
+    def _background_search(self, game, stop, time_limit):
+        self._thread_result = self._play_search(game, stop, time_limit)
+        
+    def start_pondering(self, game):
+        """Search the expected reply in the background while the opponent thinks"""
+        if not self.ponder or game.game_over or game.to_move == self.side or len(self.pv) < 2:
+            return
+        self.stop_pondering()
+        
+        reply = self.pv[1]
+        ponder_game = game.copy()
+        move_list = MoveList()
+        ponder_game.generate_moves(move_list)
+        if reply not in move_list or not ponder_game.is_legal(reply):
+            return
+        ponder_game.make_move(reply)
+        
+        self._ponder_move = reply
+        self._ponder_ply = len(game.game_state.move_history) + 1
+        self._start_background(ponder_game, None)
+        
+    def stop_pondering(self):
+        """Cancel a running ponder search, keeping the warmed hash table"""
+        if self._thread is None or self._ponder_move is None:
+            return
+        self._thread_stop.set()
+        self._thread.join()
+        self._thread = None
+        self._thread_result = None
+        self._ponder_move = None
+        
+    def _is_ponder_hit(self, game):
+        """Whether the running ponder search is on this position"""
+        if self._thread is None or self._ponder_move is None:
+            return False
+        history = game.game_state.move_history
+        return len(history) == self._ponder_ply and history[-1] == self._ponder_move
     
     def evaluate_position(self, game):
         """Advanced position evaluation function"""
@@ -204,6 +961,13 @@ class ChessBot:
             else:
                 return -10000
                 
+        # Specialised endgame knowledge for known material balances
+        endgame = ENDGAMES.get(game.material_key)
+        if endgame is not None and endgame[1] == "eval":
+            function, _, strong = endgame
+            score = function(game, strong)
+            return score if strong == self.side else -score
+            
         score = 0
         
         # Material and positional values
@@ -228,6 +992,8 @@ class ChessBot:
                 piece_value += KING_MIDDLEGAME_TABLE[y][x]
                 
             # Add mobility bonus
+            if self.stats:
+                self.stats.legal_move_calls += 1
             mobility = len(game.legal_moves(piece))
             piece_value += mobility * 2
             
@@ -236,6 +1002,20 @@ class ChessBot:
             else:
                 score -= piece_value
         
+        # Pawn structure, cached by the pawn-only hash key
+        pawn_key = game.pawn_key
+        entry = self.pawn_hash[pawn_key & PAWN_HASH_MASK]
+        if self.stats:
+            self.stats.pawn_probes += 1
+        if entry is not None and entry[0] == pawn_key:
+            pawn_score = entry[1]
+            if self.stats:
+                self.stats.pawn_hits += 1
+        else:
+            pawn_score = evaluate_pawns(game)
+            self.pawn_hash[pawn_key & PAWN_HASH_MASK] = (pawn_key, pawn_score)
+        score += pawn_score if self.side == WHITE else -pawn_score
+        
         # Center control bonus
         center_squares = [(3,3), (3,4), (4,3), (4,4)]
         for x, y in center_squares:
@@ -253,59 +1033,70 @@ class ChessBot:
         if game.is_in_check(enemy_side):
             score += 50
             
-        return score
-    
-    def order_moves(self, game, moves):
-        """Order moves for better alpha-beta pruning"""
-        def move_priority(move):
-            pid, target = move
-            priority = 0
-            
-            # Prioritize captures
-            if game.board[target[0]][target[1]]:
-                captured = game.pieces[game.board[target[0]][target[1]]]
-                priority += PIECE_VALUES[captured.ptype]
+        # Scale drawish endgames towards zero
+        if endgame is not None:
+            function, _, strong = endgame
+            if strong is None or (score > 0) == (strong == self.side):
+                score = score * function(game, strong) / SCALE_NORMAL
                 
-            # Prioritize center moves
-            center_dist = abs(target[0] - 3.5) + abs(target[1] - 3.5)
-            priority -= center_dist
-            
-            return priority
-            
-        return sorted(moves, key=move_priority, reverse=True)
+        return score
     
-    def copy_game(self, game):
-        """Create a deep copy of the game state"""
-        new_game = ChessGame()
-        new_game.board = copy.deepcopy(game.board)
-        new_game.pieces = {}
-        for pid, piece in game.pieces.items():
-            new_game.pieces[pid] = piece.copy()
-        new_game.to_move = game.to_move
-        new_game.game_state = copy.deepcopy(game.game_state)
-        new_game.game_over = game.game_over
-        new_game.winner = game.winner
-        return new_game
+    def score_captures(self, game, move_list):
+        """Score captures by MVV-LVA: most valuable victim, then least valuable attacker"""
+        board, pieces = game.board, game.pieces
+        moves, scores = move_list.moves, move_list.scores
+        for i in range(move_list.count):
+            move = moves[i]
+            frm, flags = move & 63, move >> 12
+            attacker = PIECE_VALUES[pieces[board[frm & 7][frm >> 3]].ptype]
+            if flags == EP_CAPTURE:
+                victim = PIECE_VALUES["P"]
+            elif flags & CAPTURE:
+                victim = PIECE_VALUES[pieces[board[(move >> 6) & 7][(move >> 9) & 7]].ptype]
+            else:
+                victim = 0
+            if flags & PROMOTION:
+                victim += PIECE_VALUES[PROMOTION_PIECES[flags & 3]]
+            scores[i] = victim * 32 - attacker // 100
     
-    def execute_move_on_copy(self, game_copy, piece, target):
-        """Execute a move on a game copy"""
-        return game_copy.execute_move_internal(piece, target)
+    def score_moves(self, game, move_list, tt_move=NO_MOVE):
+        """Score moves for ordering: hash move, then captures by victim value, then central targets"""
+        board, pieces = game.board, game.pieces
+        moves, scores = move_list.moves, move_list.scores
+        for i in range(move_list.count):
+            move = moves[i]
+            if move == tt_move:
+                scores[i] = 1 << 20
+                continue
+            tx, ty = (move >> 6) & 7, (move >> 9) & 7
+            score = -(abs(2 * tx - 7) + abs(2 * ty - 7))
+            victim = board[tx][ty]
+            if victim is not None:
+                score += 2 * PIECE_VALUES[pieces[victim].ptype]
+            scores[i] = score
 
 class ChessGame:
-    def __init__(self, vs_ai=False, player_side=WHITE, ai_difficulty=3):
+    def __init__(self, vs_ai=False, player_side=WHITE, ai_difficulty=3, ai_ponder=False, ai_level=None):
         self.board = [[None for _ in range(8)] for _ in range(8)]
         self.pieces = {}
         self.to_move = WHITE
         self.game_state = GameState()
         self.game_over = False
         self.winner = None
+        self.status = ONGOING
+        self.material_key = 0  # See material_signature()
+        self.material = {WHITE: 0, BLACK: 0}
+        self.pawn_key = 0  # Zobrist key of the pawns alone
         self.vs_ai = vs_ai
         self.ai_bot = None
+        self.hint_bot = None  # Created for the first hint, reused for later ones
+        self.start_fen = None  # None for the standard starting position
         if vs_ai:
             ai_side = BLACK if player_side == WHITE else WHITE
-            self.ai_bot = ChessBot(ai_side, ai_difficulty)
-            print(f"\n🤖 {self.ai_bot.name}: Hello! I'll be playing as {'White' if ai_side == WHITE else 'Black'}.")
-            print(f"🤖 {self.ai_bot.name}: I'm set to difficulty level {ai_difficulty}. Good luck!")
+            if ai_level is not None:
+                self.ai_bot = bot_for_level(ai_side, ai_level, ponder=ai_ponder)
+            else:
+                self.ai_bot = ChessBot(ai_side, ai_difficulty, ponder=ai_ponder)
         self.init_board()
 
     def init_board(self):
@@ -338,6 +1129,136 @@ class ChessGame:
     def add(self, piece):
         self.pieces[piece.id] = piece
         self.board[piece.x][piece.y] = piece.id
+        self.material_key += MATERIAL_UNIT[(piece.side, piece.ptype)]
+        self.material[piece.side] += PIECE_VALUES[piece.ptype]
+        if piece.ptype == "P":
+            self.pawn_key ^= ZOBRIST_PIECES[piece.side, "P"][piece.x][piece.y]
+
+    def copy(self):
+        """Create a deep copy of the game state (without the AI opponent)"""
+        new_game = ChessGame()
+        new_game.board = [column[:] for column in self.board]
+        new_game.pieces = {}
+        for pid, piece in self.pieces.items():
+            new_game.pieces[pid] = piece.copy()
+        new_game.to_move = self.to_move
+        new_game.game_state = self.game_state.copy()
+        new_game.game_over = self.game_over
+        new_game.winner = self.winner
+        new_game.status = self.status
+        new_game.material_key = self.material_key
+        new_game.material = dict(self.material)
+        new_game.pawn_key = self.pawn_key
+        new_game.start_fen = self.start_fen
+        return new_game
+
+    def load_fen(self, fen):
+        """Set up the position from a FEN string"""
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        placement, side, castling, ep = fields[:4]
+        rows = placement.split("/")
+        if len(rows) != 8 or side not in ("w", "b"):
+            raise ValueError(f"Invalid FEN: {fen!r}")
+            
+        squares = []
+        for i, row in enumerate(rows):
+            y, x = 7 - i, 0
+            for ch in row:
+                if ch.isdigit():
+                    x += int(ch)
+                elif ch.upper() in PIECE_VALUES:
+                    squares.append((WHITE if ch.isupper() else BLACK, ch.upper(), x, y))
+                    x += 1
+                else:
+                    raise ValueError(f"Invalid FEN piece {ch!r}")
+            if x != 8:
+                raise ValueError(f"Invalid FEN: {fen!r}")
+                
+        self.board = [[None for _ in range(8)] for _ in range(8)]
+        self.pieces = {}
+        self.material_key = 0
+        self.material = {WHITE: 0, BLACK: 0}
+        self.pawn_key = 0
+        self.game_state = GameState()
+        self.game_over = False
+        self.winner = None
+        self.status = ONGOING
+        self.start_fen = fen
+        
+        # Kings, castling rooks and pawns on their own file keep their usual IDs
+        rights = {right: right[0] in castling if right.endswith("_W") else right[0].lower() in castling
+                  for right in CASTLING_PIECES}
+        rest = []
+        for side_, ptype, x, y in squares:
+            home = 0 if side_ == WHITE else 7
+            pid = None
+            if ptype == "K" and f"K{side_}" not in self.pieces:
+                pid = f"K{side_}"
+            elif ptype == "R" and y == home and x in (0, 7) and rights[("K" if x == 7 else "Q") + side_]:
+                pid = f"R{2 if x == 7 else 1}{side_}"
+            elif ptype == "P" and f"P{x + 1}{side_}" not in self.pieces:
+                pid = f"P{x + 1}{side_}"
+            if pid is None:
+                rest.append((side_, ptype, x, y))
+            else:
+                self.add(Piece(pid, ptype, side_, x, y))
+        for side_, ptype, x, y in rest:
+            n = 1
+            while True:
+                pid = f"Q{side_}" if ptype == "Q" and n == 1 else f"{ptype}{n}{side_}"
+                if pid not in self.pieces:
+                    break
+                n += 1
+            self.add(Piece(pid, ptype, side_, x, y))
+            
+        # Derive the moved flags the move generator relies on
+        for piece in self.pieces.values():
+            if piece.ptype == "P":
+                piece.moved = piece.y != (1 if piece.side == WHITE else 6)
+            elif piece.ptype == "K":
+                piece.moved = not (rights["K" + piece.side] or rights["Q" + piece.side])
+            elif piece.ptype == "R":
+                piece.moved = True
+        for right, (king_id, rook_id) in CASTLING_PIECES.items():
+            if rights[right] and rook_id in self.pieces:
+                self.pieces[rook_id].moved = False
+            self.game_state.castling_rights[right] = rights[right]
+            
+        self.to_move = WHITE if side == "w" else BLACK
+        if ep != "-":
+            self.game_state.en_passant_target = self.parse_square(ep)
+        if len(fields) >= 6:
+            self.game_state.halfmove_clock = int(fields[4])
+            self.game_state.fullmove_number = int(fields[5])
+
+    def fen(self):
+        """FEN string of the current position"""
+        rows = []
+        for y in range(7, -1, -1):
+            row, empty = "", 0
+            for x in range(8):
+                piece = self.get_piece_at(x, y)
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece.ptype if piece.side == WHITE else piece.ptype.lower()
+            rows.append(row + (str(empty) if empty else ""))
+            
+        castling = ""
+        for right, (king_id, rook_id) in CASTLING_PIECES.items():
+            king, rook = self.pieces.get(king_id), self.pieces.get(rook_id)
+            if king and rook and king.alive and rook.alive and not king.moved and not rook.moved:
+                castling += right[0] if right.endswith("_W") else right[0].lower()
+        ep = self.game_state.en_passant_target
+        ep_str = self.square_to_str(*ep).lower() if ep else "-"
+        side = "w" if self.to_move == WHITE else "b"
+        return (f"{'/'.join(rows)} {side} {castling or '-'} {ep_str} "
+                f"{self.game_state.halfmove_clock} {self.game_state.fullmove_number}")
 
     def parse_square(self, s):
         s = s.strip().upper()
@@ -350,6 +1271,22 @@ class ChessGame:
     def square_to_str(self, x, y):
         return f"{FILES[x]}{RANKS[y]}"
 
+    def position_key(self):
+        """Zobrist hash of the position (pieces, castling, en passant, side to move)"""
+        key = 0
+        for piece in self.pieces.values():
+            if piece.alive:
+                key ^= ZOBRIST_PIECES[piece.side, piece.ptype][piece.x][piece.y]
+        for right, (king_id, rook_id) in CASTLING_PIECES.items():
+            king, rook = self.pieces.get(king_id), self.pieces.get(rook_id)
+            if king and rook and king.alive and rook.alive and not king.moved and not rook.moved:
+                key ^= ZOBRIST_CASTLING[right]
+        if self.game_state.en_passant_target:
+            key ^= ZOBRIST_EP_FILE[self.game_state.en_passant_target[0]]
+        if self.to_move == BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
+
     def get_piece_at(self, x, y):
         if 0 <= x < 8 and 0 <= y < 8 and self.board[x][y]:
             return self.pieces[self.board[x][y]]
@@ -439,118 +1376,128 @@ class ChessGame:
         if not piece.alive:
             return []
             
-        pseudo_moves = self.get_pseudo_legal_moves(piece)
+        move_list = MoveList()
+        self.add_piece_moves(piece, move_list)
         legal_moves = []
-        
-        for move in pseudo_moves:
-            if self.is_legal_move(piece, move):
-                legal_moves.append(move)
+        for move in move_list:
+            target = ((move >> 6) & 7, move >> 9 & 7)
+            if target not in legal_moves and self.is_legal(move):
+                legal_moves.append(target)
                 
         return legal_moves
 
     def get_pseudo_legal_moves(self, piece):
         """Get pseudo-legal moves (ignoring check)"""
+        move_list = MoveList()
+        self.add_piece_moves(piece, move_list)
         moves = []
+        for move in move_list:
+            target = ((move >> 6) & 7, move >> 9 & 7)
+            if target not in moves:
+                moves.append(target)
+        return moves
+
+    def generate_moves(self, move_list, kind=GEN_ALL):
+        """Fill the move list with packed pseudo-legal moves for the side to move
+        
+        `kind` selects captures and promotions (GEN_CAPTURES), the other
+        moves (GEN_QUIETS) or both.
+        """
+        move_list.count = 0
+        for piece in self.pieces.values():
+            if piece.alive and piece.side == self.to_move:
+                self.add_piece_moves(piece, move_list, kind)
+
+    def add_piece_moves(self, piece, move_list, kind=GEN_ALL):
+        """Append the packed pseudo-legal moves of a piece to the move list"""
+        board, pieces = self.board, self.pieces
+        moves, n = move_list.moves, move_list.count
         x, y = piece.x, piece.y
+        side = piece.side
+        frm = y * 8 + x
+        ptype = piece.ptype
+        captures, quiets = kind & GEN_CAPTURES, kind & GEN_QUIETS
         
-        if piece.ptype == "P":
-            dy = 1 if piece.side == WHITE else -1
-            
-            # Forward move
-            nx, ny = x, y + dy
-            if 0 <= ny < 8 and not self.board[nx][ny]:
-                moves.append((nx, ny))
-                
-                # Double move from starting position
-                if not piece.moved:
-                    nx2, ny2 = x, y + 2*dy
-                    if 0 <= ny2 < 8 and not self.board[nx2][ny2]:
-                        moves.append((nx2, ny2))
-            
-            # Captures
-            for dx in [-1, 1]:
+        if ptype == "P":
+            dy = 1 if side == WHITE else -1
+            ny = y + dy
+            promotes = ny == 7 or ny == 0
+            if 0 <= ny < 8:
+                # Forward move
+                if board[x][ny] is None:
+                    to = frm | ((ny * 8 + x) << 6)
+                    if promotes:
+                        if captures:
+                            for promotion in range(4):
+                                moves[n] = to | ((PROMOTION | promotion) << 12)
+                                n += 1
+                    elif quiets:
+                        moves[n] = to
+                        n += 1
+                        # Double move from starting position
+                        ny2 = y + 2 * dy
+                        if not piece.moved and 0 <= ny2 < 8 and board[x][ny2] is None:
+                            moves[n] = frm | ((ny2 * 8 + x) << 6) | (DOUBLE_PUSH << 12)
+                            n += 1
+                # Captures
+                for nx in (x - 1, x + 1):
+                    if captures and 0 <= nx < 8:
+                        target_id = board[nx][ny]
+                        to = frm | ((ny * 8 + nx) << 6)
+                        if target_id is not None:
+                            if pieces[target_id].side != side:
+                                if promotes:
+                                    for promotion in range(4):
+                                        moves[n] = to | ((PROMOTION | CAPTURE | promotion) << 12)
+                                        n += 1
+                                else:
+                                    moves[n] = to | (CAPTURE << 12)
+                                    n += 1
+                        # En passant (only for the side to move, the target belongs to its opponent's pawn)
+                        elif self.game_state.en_passant_target == (nx, ny) and side == self.to_move:
+                            moves[n] = to | (EP_CAPTURE << 12)
+                            n += 1
+                            
+        elif ptype == "N" or ptype == "K":
+            for dx, dy in (KNIGHT_OFFSETS if ptype == "N" else KING_OFFSETS):
                 nx, ny = x + dx, y + dy
                 if 0 <= nx < 8 and 0 <= ny < 8:
-                    target_piece = self.get_piece_at(nx, ny)
-                    if target_piece and target_piece.side != piece.side:
-                        moves.append((nx, ny))
-                    # En passant
-                    elif self.game_state.en_passant_target == (nx, ny):
-                        moves.append((nx, ny))
+                    target_id = board[nx][ny]
+                    if target_id is None:
+                        if quiets:
+                            moves[n] = frm | ((ny * 8 + nx) << 6)
+                            n += 1
+                    elif captures and pieces[target_id].side != side:
+                        moves[n] = frm | ((ny * 8 + nx) << 6) | (CAPTURE << 12)
+                        n += 1
                         
-        elif piece.ptype == "R":
-            directions = [(1,0), (-1,0), (0,1), (0,-1)]
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                while 0 <= nx < 8 and 0 <= ny < 8:
-                    target_piece = self.get_piece_at(nx, ny)
-                    if not target_piece:
-                        moves.append((nx, ny))
-                    else:
-                        if target_piece.side != piece.side:
-                            moves.append((nx, ny))
-                        break
-                    nx += dx
-                    ny += dy
-                    
-        elif piece.ptype == "N":
-            knight_moves = [(2,1), (2,-1), (-2,1), (-2,-1), (1,2), (1,-2), (-1,2), (-1,-2)]
-            for dx, dy in knight_moves:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < 8 and 0 <= ny < 8:
-                    target_piece = self.get_piece_at(nx, ny)
-                    if not target_piece or target_piece.side != piece.side:
-                        moves.append((nx, ny))
-                        
-        elif piece.ptype == "B":
-            directions = [(1,1), (1,-1), (-1,1), (-1,-1)]
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                while 0 <= nx < 8 and 0 <= ny < 8:
-                    target_piece = self.get_piece_at(nx, ny)
-                    if not target_piece:
-                        moves.append((nx, ny))
-                    else:
-                        if target_piece.side != piece.side:
-                            moves.append((nx, ny))
-                        break
-                    nx += dx
-                    ny += dy
+            # Castling
+            if ptype == "K" and quiets and not piece.moved and not self.is_in_check(side):
+                if self.can_castle_kingside(side):
+                    moves[n] = frm | ((frm + 2) << 6) | (KING_CASTLE << 12)
+                    n += 1
+                if self.can_castle_queenside(side):
+                    moves[n] = frm | ((frm - 2) << 6) | (QUEEN_CASTLE << 12)
+                    n += 1
                     
-        elif piece.ptype == "Q":
-            directions = [(1,0), (-1,0), (0,1), (0,-1), (1,1), (1,-1), (-1,1), (-1,-1)]
-            for dx, dy in directions:
+        else:
+            for dx, dy in SLIDER_DIRECTIONS[ptype]:
                 nx, ny = x + dx, y + dy
                 while 0 <= nx < 8 and 0 <= ny < 8:
-                    target_piece = self.get_piece_at(nx, ny)
-                    if not target_piece:
-                        moves.append((nx, ny))
+                    target_id = board[nx][ny]
+                    if target_id is None:
+                        if quiets:
+                            moves[n] = frm | ((ny * 8 + nx) << 6)
+                            n += 1
                     else:
-                        if target_piece.side != piece.side:
-                            moves.append((nx, ny))
+                        if captures and pieces[target_id].side != side:
+                            moves[n] = frm | ((ny * 8 + nx) << 6) | (CAPTURE << 12)
+                            n += 1
                         break
                     nx += dx
                     ny += dy
                     
-        elif piece.ptype == "K":
-            king_moves = [(1,0), (-1,0), (0,1), (0,-1), (1,1), (1,-1), (-1,1), (-1,-1)]
-            for dx, dy in king_moves:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < 8 and 0 <= ny < 8:
-                    target_piece = self.get_piece_at(nx, ny)
-                    if not target_piece or target_piece.side != piece.side:
-                        moves.append((nx, ny))
-            
-            # Castling
-            if not piece.moved and not self.is_in_check(piece.side):
-                # Kingside castling
-                if self.can_castle_kingside(piece.side):
-                    moves.append((x + 2, y))
-                # Queenside castling
-                if self.can_castle_queenside(piece.side):
-                    moves.append((x - 2, y))
-                    
-        return moves
+        move_list.count = n
 
     def can_castle_kingside(self, side):
         """Check if kingside castling is possible"""
@@ -610,241 +1557,230 @@ class ChessGame:
 
     def is_legal_move(self, piece, target):
         """Check if a move is legal (doesn't leave king in check)"""
-        # Make a copy of the game state
-        original_board = copy.deepcopy(self.board)
-        original_pieces = {}
-        for pid, p in self.pieces.items():
-            original_pieces[pid] = p.copy()
-        original_game_state = copy.deepcopy(self.game_state)
-        
-        # Try the move
-        success = self.execute_move_internal(piece, target)
-        if not success:
-            # Restore state
-            self.board = original_board
-            self.pieces = original_pieces
-            self.game_state = original_game_state
+        move = self.encode(piece, target)
+        move_list = MoveList()
+        self.add_piece_moves(piece, move_list)
+        return move in move_list and self.is_legal(move)
+
+    def is_pseudo_legal(self, move):
+        """Check that a packed move from another position is pseudo-legal here"""
+        frm = move & 63
+        pid = self.board[frm & 7][frm >> 3]
+        if pid is None or self.pieces[pid].side != self.to_move:
             return False
-            
-        # Check if our king is in check after the move
-        is_legal = not self.is_in_check(piece.side)
-        
-        # Restore state
-        self.board = original_board
-        self.pieces = original_pieces
-        self.game_state = original_game_state
-        
-        return is_legal
+        kind = GEN_CAPTURES if move >> 12 & (CAPTURE | PROMOTION) else GEN_QUIETS
+        move_list = MoveList()
+        self.add_piece_moves(self.pieces[pid], move_list, kind)
+        return move in move_list
+
+    def is_legal(self, move):
+        """Check that a packed pseudo-legal move doesn't leave the own king in check"""
+        frm = move & 63
+        side = self.pieces[self.board[frm & 7][frm >> 3]].side
+        undo = self.make_move(move)
+        legal = not self.is_in_check(side)
+        self.unmake_move(move, undo)
+        return legal
 
-    def execute_move_internal(self, piece, target):
-        """Execute move without checking legality"""
+    def encode(self, piece, target, promotion=None):
+        """Packed move for moving a piece to a target square"""
         tx, ty = target
+        frm, to = piece.y * 8 + piece.x, ty * 8 + tx
+        flags = QUIET
+        if piece.ptype == "K" and abs(tx - piece.x) == 2:
+            flags = KING_CASTLE if tx > piece.x else QUEEN_CASTLE
+        elif piece.ptype == "P":
+            if self.board[tx][ty] is not None:
+                flags = CAPTURE
+            elif tx != piece.x and target == self.game_state.en_passant_target:
+                flags = EP_CAPTURE
+            elif abs(ty - piece.y) == 2:
+                flags = DOUBLE_PUSH
+            if ty == 7 or ty == 0:
+                flags |= PROMOTION | PROMOTION_PIECES.index((promotion or "Q").upper())
+        elif self.board[tx][ty] is not None:
+            flags = CAPTURE
+        return frm | (to << 6) | (flags << 12)
+
+    def decode(self, move):
+        """Piece ID, target square and promotion piece of a packed move (before it is made)"""
+        frm, to = move & 63, (move >> 6) & 63
+        return self.board[frm & 7][frm >> 3], (to & 7, to >> 3), move_promotion(move)
+
+    def make_move(self, move):
+        """Make a packed move and return what unmake_move needs to take it back"""
+        frm, to, flags = move & 63, (move >> 6) & 63, move >> 12
+        fx, fy, tx, ty = frm & 7, frm >> 3, to & 7, to >> 3
+        board, state = self.board, self.game_state
+        pid = board[fx][fy]
+        piece = self.pieces[pid]
+        moved, ep_target = piece.moved, state.en_passant_target
+        halfmove_clock, fullmove_number = state.halfmove_clock, state.fullmove_number
         
         # Handle captures
-        captured_piece = None
-        if self.board[tx][ty]:
-            captured_piece = self.pieces[self.board[tx][ty]]
-            captured_piece.alive = False
+        captured_id = None
+        if flags & CAPTURE:
+            if flags == EP_CAPTURE:
+                captured_id = board[tx][fy]
+                board[tx][fy] = None
+            else:
+                captured_id = board[tx][ty]
+            captured = self.pieces[captured_id]
+            captured.alive = False
+            self.material_key -= MATERIAL_UNIT[(captured.side, captured.ptype)]
+            self.material[captured.side] -= PIECE_VALUES[captured.ptype]
+            if captured.ptype == "P":
+                self.pawn_key ^= ZOBRIST_PIECES[captured.side, "P"][captured.x][captured.y]
             
-        # Handle en passant capture
-        if (piece.ptype == "P" and self.game_state.en_passant_target == target):
-            # Remove the captured pawn
-            ep_pawn_y = ty - (1 if piece.side == WHITE else -1)
-            if self.board[tx][ep_pawn_y]:
-                self.pieces[self.board[tx][ep_pawn_y]].alive = False
-                self.board[tx][ep_pawn_y] = None
-                
-        # Handle castling
-        if piece.ptype == "K" and abs(tx - piece.x) == 2:
-            # Move the rook
-            if tx > piece.x:  # Kingside
-                rook_id = f"R2{piece.side}"
-                rook = self.pieces[rook_id]
-                self.board[rook.x][rook.y] = None
-                rook.x = tx - 1
-                self.board[rook.x][rook.y] = rook_id
-                rook.moved = True
-            else:  # Queenside
-                rook_id = f"R1{piece.side}"
-                rook = self.pieces[rook_id]
-                self.board[rook.x][rook.y] = None
-                rook.x = tx + 1
-                self.board[rook.x][rook.y] = rook_id
-                rook.moved = True
-                
         # Move the piece
-        self.board[piece.x][piece.y] = None
+        board[fx][fy] = None
+        board[tx][ty] = pid
         piece.x, piece.y = tx, ty
-        self.board[tx][ty] = piece.id
         piece.moved = True
+        if piece.ptype == "P":
+            pawn_squares = ZOBRIST_PIECES[piece.side, "P"]
+            self.pawn_key ^= pawn_squares[fx][fy]
+            if not flags & PROMOTION:
+                self.pawn_key ^= pawn_squares[tx][ty]
         
-        return True
+        # Handle castling
+        rook_moved = None
+        if flags == KING_CASTLE or flags == QUEEN_CASTLE:
+            rook = self.pieces[f"R2{piece.side}" if flags == KING_CASTLE else f"R1{piece.side}"]
+            rook_moved = rook.moved
+            board[rook.x][rook.y] = None
+            rook.x = tx - 1 if flags == KING_CASTLE else tx + 1
+            board[rook.x][rook.y] = rook.id
+            rook.moved = True
+            
+        # Handle pawn promotion
+        if flags & PROMOTION:
+            piece.ptype = PROMOTION_PIECES[flags & 3]
+            self.material_key += MATERIAL_UNIT[(piece.side, piece.ptype)] - MATERIAL_UNIT[(piece.side, "P")]
+            self.material[piece.side] += PIECE_VALUES[piece.ptype] - PIECE_VALUES["P"]
+            
+        state.en_passant_target = (fx, (fy + ty) >> 1) if flags == DOUBLE_PUSH else None
+        if piece.ptype == "P" or captured_id is not None or flags & PROMOTION:
+            state.halfmove_clock = 0
+        else:
+            state.halfmove_clock += 1
+        if piece.side == BLACK:
+            state.fullmove_number += 1
+        self.to_move = BLACK if self.to_move == WHITE else WHITE
+        return captured_id, moved, rook_moved, ep_target, halfmove_clock, fullmove_number
 
-    def show(self):
-        print("\n    A   B   C   D   E   F   G   H")
-        print("  +---+---+---+---+---+---+---+---+")
-        for y in range(7, -1, -1):
-            row = []
-            for x in range(8):
-                pid = self.board[x][y]
-                if pid:
-                    piece = self.pieces[pid]
-                    if piece.alive:
-                        color = "W" if piece.side == WHITE else "B"
-                        display = f"{piece.ptype}{color}"
-                        row.append(f"{display:2}")
-                    else:
-                        row.append(" .")
-                else:
-                    row.append(" .")
-            print(f"{RANKS[y]} | " + " | ".join(row) + f" | {RANKS[y]}")
-            print("  +---+---+---+---+---+---+---+---+")
-        print("    A   B   C   D   E   F   G   H\n")
-        
-        turn_str = 'White' if self.to_move == WHITE else 'Black'
-        print(f"Turn: {turn_str}")
+    def unmake_move(self, move, undo):
+        """Take back a move made with make_move"""
+        frm, to, flags = move & 63, (move >> 6) & 63, move >> 12
+        fx, fy, tx, ty = frm & 7, frm >> 3, to & 7, to >> 3
+        captured_id, moved, rook_moved, ep_target, halfmove_clock, fullmove_number = undo
+        board, state = self.board, self.game_state
+        pid = board[tx][ty]
+        piece = self.pieces[pid]
         
-        if self.is_in_check(self.to_move):
-            print("CHECK!")
+        board[tx][ty] = None
+        board[fx][fy] = pid
+        piece.x, piece.y = fx, fy
+        piece.moved = moved
+        if flags & PROMOTION:
+            self.material_key -= MATERIAL_UNIT[(piece.side, piece.ptype)] - MATERIAL_UNIT[(piece.side, "P")]
+            self.material[piece.side] -= PIECE_VALUES[piece.ptype] - PIECE_VALUES["P"]
+            piece.ptype = "P"
+            self.pawn_key ^= ZOBRIST_PIECES[piece.side, "P"][fx][fy]
+        elif piece.ptype == "P":
+            pawn_squares = ZOBRIST_PIECES[piece.side, "P"]
+            self.pawn_key ^= pawn_squares[fx][fy] ^ pawn_squares[tx][ty]
             
-        if self.game_over:
-            if self.winner:
-                winner_str = 'White' if self.winner == WHITE else 'Black'
-                print(f"CHECKMATE! {winner_str} wins!")
-                if self.vs_ai:
-                    if self.winner == self.ai_bot.side:
-                        print(f"🤖 {self.ai_bot.name}: Good game! I enjoyed our match.")
-                    else:
-                        print(f"🤖 {self.ai_bot.name}: Well played! You got me this time.")
-            else:
-                print("STALEMATE! Draw!")
-                if self.vs_ai:
-                    print(f"🤖 {self.ai_bot.name}: A draw! That was a challenging game.")
+        if captured_id is not None:
+            captured = self.pieces[captured_id]
+            captured.alive = True
+            board[captured.x][captured.y] = captured_id
+            self.material_key += MATERIAL_UNIT[(captured.side, captured.ptype)]
+            self.material[captured.side] += PIECE_VALUES[captured.ptype]
+            if captured.ptype == "P":
+                self.pawn_key ^= ZOBRIST_PIECES[captured.side, "P"][captured.x][captured.y]
+            
+        if rook_moved is not None:
+            rook = self.pieces[f"R2{piece.side}" if flags == KING_CASTLE else f"R1{piece.side}"]
+            board[rook.x][rook.y] = None
+            rook.x = tx + 1 if flags == KING_CASTLE else tx - 2
+            board[rook.x][rook.y] = rook.id
+            rook.moved = rook_moved
+            
+        state.en_passant_target = ep_target
+        state.halfmove_clock = halfmove_clock
+        state.fullmove_number = fullmove_number
+        self.to_move = BLACK if self.to_move == WHITE else WHITE
 
-    def discover(self, pid):
-        if pid not in self.pieces or not self.pieces[pid].alive:
-            print("Invalid piece.")
-            return
-        p = self.pieces[pid]
-        moves = self.legal_moves(p)
-        if not moves:
-            print(f"{pid} has no legal moves.")
-        else:
-            move_strs = [self.square_to_str(x, y) for x, y in moves]
-            print(f"{pid} can move to: " + ", ".join(move_strs))
+    def is_promotion(self, piece, target):
+        """Check if moving the piece to the target square promotes a pawn"""
+        return piece.ptype == "P" and target[1] in (0, 7)
 
-    def move(self, pid, target_str):
+    def apply_move(self, move, promotion=None):
+        """Validate and play a move without any console output
+        
+        `move` is a packed move or a (piece ID, square) pair such as
+        ("P5_W", "E4"). Returns a MoveResult; when the move is rejected the
+        game is unchanged and `error` says why. A pawn reaching the last
+        rank needs a promotion piece (Q, R, B or N).
+        """
         if self.game_over:
-            print("Game is over!")
-            return False
+            return MoveResult(False, "Game is over!")
+        if isinstance(move, int):
+            pid, target, packed_promotion = self.decode(move)
+            promotion = promotion or packed_promotion
+        else:
+            pid, square = move
+            target = self.parse_square(square) if isinstance(square, str) else square
             
         if pid not in self.pieces or not self.pieces[pid].alive:
-            print("Invalid piece.")
-            return False
+            return MoveResult(False, "Invalid piece.")
         p = self.pieces[pid]
         if p.side != self.to_move:
-            print("Not your turn.")
-            return False
-        target = self.parse_square(target_str)
+            return MoveResult(False, "Not your turn.")
         if not target:
-            print("Invalid square.")
-            return False
+            return MoveResult(False, "Invalid square.")
+        if promotion:
+            promotion = promotion.upper()
+            if promotion not in ("Q", "R", "N", "B"):
+                return MoveResult(False, "Invalid promotion piece.")
         moves = self.legal_moves(p)
         if target not in moves:
             if moves:
                 move_strs = [self.square_to_str(x, y) for x, y in moves]
-                print(f"Illegal. {pid} can go: " + ", ".join(move_strs))
-            else:
-                print(f"{pid} has no legal moves.")
-            return False
-            
-        # Execute the move
-        tx, ty = target
-        
-        # Reset en passant
-        self.game_state.en_passant_target = None
-        
-        # Handle pawn double move (set en passant target)
-        if p.ptype == "P" and abs(ty - p.y) == 2:
-            ep_y = p.y + (1 if p.side == WHITE else -1)
-            self.game_state.en_passant_target = (p.x, ep_y)
-            
-        # Handle captures for 50-move rule
-        is_capture = self.board[tx][ty] is not None
-        if p.ptype == "P" or is_capture:
-            self.game_state.halfmove_clock = 0
+                return MoveResult(False, f"Illegal. {pid} can go: " + ", ".join(move_strs))
+            return MoveResult(False, f"{pid} has no legal moves.")
+        if self.is_promotion(p, target):
+            if not promotion:
+                return MoveResult(False, "Promotion piece required.", needs_promotion=True)
         else:
-            self.game_state.halfmove_clock += 1
-            
-        # Execute move
-        captured_piece = None
-        if self.board[tx][ty]:
-            captured_piece = self.pieces[self.board[tx][ty]]
-            captured_piece.alive = False
+            promotion = None
             
-        # Handle en passant capture
-        if (p.ptype == "P" and target == self.game_state.en_passant_target):
-            ep_pawn_y = ty - (1 if p.side == WHITE else -1)
-            if self.board[tx][ep_pawn_y]:
-                self.pieces[self.board[tx][ep_pawn_y]].alive = False
-                self.board[tx][ep_pawn_y] = None
-                
-        # Handle castling
-        if p.ptype == "K" and abs(tx - p.x) == 2:
-            if tx > p.x:  # Kingside
-                rook_id = f"R2{p.side}"
-                rook = self.pieces[rook_id]
-                self.board[rook.x][rook.y] = None
-                rook.x = tx - 1
-                self.board[rook.x][rook.y] = rook_id
-                rook.moved = True
-            else:  # Queenside
-                rook_id = f"R1{p.side}"
-                rook = self.pieces[rook_id]
-                self.board[rook.x][rook.y] = None
-                rook.x = tx + 1
-                self.board[rook.x][rook.y] = rook_id
-                rook.moved = True
-                
-        # Move the piece
-        self.board[p.x][p.y] = None
-        p.x, p.y = tx, ty
-        self.board[tx][ty] = pid
-        p.moved = True
-        
-        # Handle pawn promotion
-        if p.ptype == "P" and (ty == 7 or ty == 0):
-            if self.vs_ai and p.side == self.ai_bot.side:
-                # AI always promotes to queen
-                p.ptype = "Q"
-                print(f"🤖 {self.ai_bot.name}: I'll promote my pawn to a Queen!")
-            else:
-                while True:
-                    choice = input("Promote pawn to (Q/R/N/B): ").upper().strip()
-                    if choice in "QRNB":
-                        p.ptype = choice
-                        break
-                    print("Please enter Q, R, N, or B")
-                
-        # Switch turns
-        self.to_move = BLACK if self.to_move == WHITE else WHITE
-        if self.to_move == WHITE:
-            self.game_state.fullmove_number += 1
-            
-        # Check for game end conditions
+        tx, ty = target
+        captured = self.board[tx][ty]
+        if captured is None and p.ptype == "P" and target == self.game_state.en_passant_target:
+            captured = self.board[tx][p.y]
+        self.play_move(p, target, promotion)
         self.check_game_over()
-        
-        # AI move if it's AI's turn
-        if self.vs_ai and not self.game_over and self.to_move == self.ai_bot.side:
-            self.show()
-            self.ai_bot.think_and_move(self)
-        else:
-            self.show()
-            
-        return True
+        return MoveResult(True, move=self.game_state.move_history[-1], piece=pid, target=target,
+                          promotion=promotion, captured=captured, check=self.is_in_check(self.to_move),
+                          status=self.status, winner=self.winner)
+
+    def resign(self, side):
+        """End the game with the given side resigning"""
+        self.game_over = True
+        self.winner = BLACK if side == WHITE else WHITE
+        self.status = RESIGNATION
+        return self.status
+
+    def play_move(self, p, target, promotion=None):
+        """Apply a legal move and update the game state, without any output"""
+        move = self.encode(p, target, promotion)
+        self.make_move(move)
+        self.game_state.move_history.append(move)
 
     def check_game_over(self):
-        """Check if the game is over (checkmate, stalemate, draws)"""
+        """Check if the game is over (checkmate, stalemate, draws) and return the status"""
         # Check if current player has any legal moves
         has_legal_moves = False
         for pid, piece in self.pieces.items():
@@ -858,51 +1794,34 @@ class ChessGame:
                 # Checkmate
                 self.game_over = True
                 self.winner = BLACK if self.to_move == WHITE else WHITE
+                self.status = CHECKMATE
             else:
                 # Stalemate
                 self.game_over = True
                 self.winner = None
+                self.status = STALEMATE
                 
         # 50-move rule
         elif self.game_state.halfmove_clock >= 100:  # 50 moves = 100 half-moves
             self.game_over = True
             self.winner = None
-            print("Draw by 50-move rule!")
+            self.status = FIFTY_MOVE_RULE
             
         # Insufficient material (basic check)
         elif self.is_insufficient_material():
             self.game_over = True
             self.winner = None
-            print("Draw by insufficient material!")
+            self.status = INSUFFICIENT_MATERIAL
+            
+        return self.status
 
     def is_insufficient_material(self):
         """Check for insufficient material to mate"""
-        alive_pieces = []
-        for piece in self.pieces.values():
-            if piece.alive and piece.ptype != "K":
-                alive_pieces.append(piece.ptype)
-                
-        # King vs King
-        if not alive_pieces:
-            return True
-            
-        # King + Knight/Bishop vs King
-        if len(alive_pieces) == 1 and alive_pieces[0] in ["N", "B"]:
-            return True
-            
-        # King + Knight vs King + Knight
-        if len(alive_pieces) == 2 and all(p == "N" for p in alive_pieces):
-            return True
-            
-        return False
+        return self.material_key in INSUFFICIENT_MATERIAL_KEYS
 
     def get_material_value(self, side):
         """Calculate material value for a side"""
-        total = 0
-        for piece in self.pieces.values():
-            if piece.alive and piece.side == side:
-                total += PIECE_VALUES[piece.ptype]
-        return total
+        return self.material[side]
 
     def evaluate_position(self):
         """Simple position evaluation"""
@@ -920,7 +1839,12 @@ HELP = """
 /move <PIECE_ID> <SQUARE>    -> Move piece to target square (e.g. /move P1_W E4)
 /status                      -> Show game status
 /eval                        -> Show position evaluation
-/hint                        -> Get a move suggestion (vs AI only)
+/hint [N]                    -> Suggest the best N moves (vs AI only)
+/ponder [on|off]             -> Let the AI think on your time (vs AI only)
+/stop                        -> Make the AI move now while it thinks (vs AI only)
+/stats [on|off]              -> Show statistics of the AI's last search (vs AI only)
+/pgn [FILE]                  -> Show the game as PGN or save it to a file
+/review [DEPTH]              -> Review every move played so far
 /surrender                   -> Forfeit the game
 /help                        -> Show this help
 /quit                        -> Exit
@@ -966,52 +1890,221 @@ def choose_game_mode():
             
             # Choose difficulty
             print("\nChoose AI difficulty:")
-            print("1. Easy (depth 2)")
-            print("2. Medium (depth 3)")  
-            print("3. Hard (depth 4)")
-            print("4. Expert (depth 5)")
+            for level, skill in SKILL_LEVELS.items():
+                print(f"{level}. {skill['name']} (up to {skill['time']:g}s per move)")
             
             while True:
-                diff_choice = input("Enter difficulty (1-4): ").strip()
-                if diff_choice == "1":
-                    difficulty = 2
-                    break
-                elif diff_choice == "2":
-                    difficulty = 3
-                    break
-                elif diff_choice == "3":
-                    difficulty = 4
+                diff_choice = input(f"Enter difficulty (1-{len(SKILL_LEVELS)}): ").strip()
+                if diff_choice.isdigit() and int(diff_choice) in SKILL_LEVELS:
+                    level = int(diff_choice)
                     break
-                elif diff_choice == "4":
-                    difficulty = 5
-                    break
-                print("Please enter a number 1-4")
+                print(f"Please enter a number 1-{len(SKILL_LEVELS)}")
             
-            return ChessGame(vs_ai=True, player_side=player_side, ai_difficulty=difficulty)
+            game = ChessGame(vs_ai=True, player_side=player_side, ai_level=level)
+            bot = game.ai_bot
+            print(f"\n🤖 {bot.name}: Hello! I'll be playing as {'White' if bot.side == WHITE else 'Black'}.")
+            print(f"🤖 {bot.name}: I'm set to difficulty level {level} ({SKILL_LEVELS[level]['name']}). Good luck!")
+            return game
         else:
             print("Please enter 1 or 2")
 
+DRAW_MESSAGES = {
+    STALEMATE: "STALEMATE! Draw!",
+    FIFTY_MOVE_RULE: "Draw by 50-move rule!",
+    INSUFFICIENT_MATERIAL: "Draw by insufficient material!",
+}
+PIECE_NAMES = {"Q": "Queen", "R": "Rook", "B": "Bishop", "N": "Knight"}
+AI_MOVE_TIME = 30.0  # Seconds the AI may think before it has to move
+
+def show_board(game):
+    """Print the board, whose turn it is and how the game ended"""
+    print("\n    A   B   C   D   E   F   G   H")
+    print("  +---+---+---+---+---+---+---+---+")
+    for y in range(7, -1, -1):
+        row = []
+        for x in range(8):
+            pid = game.board[x][y]
+            if pid:
+                piece = game.pieces[pid]
+                if piece.alive:
+                    color = "W" if piece.side == WHITE else "B"
+                    display = f"{piece.ptype}{color}"
+                    row.append(f"{display:2}")
+                else:
+                    row.append(" .")
+            else:
+                row.append(" .")
+        print(f"{RANKS[y]} | " + " | ".join(row) + f" | {RANKS[y]}")
+        print("  +---+---+---+---+---+---+---+---+")
+    print("    A   B   C   D   E   F   G   H\n")
+    
+    turn_str = 'White' if game.to_move == WHITE else 'Black'
+    print(f"Turn: {turn_str}")
+    
+    if game.is_in_check(game.to_move):
+        print("CHECK!")
+        
+    if game.game_over:
+        if game.winner:
+            winner_str = 'White' if game.winner == WHITE else 'Black'
+            if game.status == RESIGNATION:
+                print(f"{winner_str} wins by resignation!")
+            else:
+                print(f"CHECKMATE! {winner_str} wins!")
+            if game.vs_ai:
+                if game.winner == game.ai_bot.side:
+                    print(f"🤖 {game.ai_bot.name}: Good game! I enjoyed our match.")
+                else:
+                    print(f"🤖 {game.ai_bot.name}: Well played! You got me this time.")
+        else:
+            print(DRAW_MESSAGES.get(game.status, "Draw!"))
+            if game.vs_ai:
+                print(f"🤖 {game.ai_bot.name}: A draw! That was a challenging game.")
+
+def discover(game, pid):
+    """Print the legal moves of a piece"""
+    if pid not in game.pieces or not game.pieces[pid].alive:
+        print("Invalid piece.")
+        return
+    moves = game.legal_moves(game.pieces[pid])
+    if not moves:
+        print(f"{pid} has no legal moves.")
+    else:
+        move_strs = [game.square_to_str(x, y) for x, y in moves]
+        print(f"{pid} can move to: " + ", ".join(move_strs))
+
+def ask_promotion():
+    while True:
+        choice = input("Promote pawn to (Q/R/N/B): ").upper().strip()
+        if choice in ("Q", "R", "N", "B"):
+            return choice
+        print("Please enter Q, R, N, or B")
+
+def human_move(game, pid, square):
+    """Play the user's move and let the AI reply"""
+    result = game.apply_move((pid, square))
+    if result.needs_promotion:
+        result = game.apply_move((pid, square), ask_promotion())
+    if not result.ok:
+        print(result.error)
+        return
+    show_board(game)
+    if game.vs_ai and not game.game_over and game.to_move == game.ai_bot.side:
+        ai_turn(game)
+
+def stop_requested(timeout):
+    """Wait up to `timeout` seconds for the user to type /stop"""
+    if not sys.stdin.isatty():
+        time.sleep(timeout)  # Leave scripted input to the command loop
+        return False
+    try:
+        ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    except (OSError, ValueError):
+        time.sleep(timeout)  # No select on console input (Windows), Ctrl+C still works
+        return False
+    if not ready:
+        return False
+    line = sys.stdin.readline()
+    if not line:
+        time.sleep(timeout)  # End of input
+        return False
+    if line.strip().lower() == "/stop":
+        return True
+    print("\nI'm still thinking. Type /stop to make me move now.")
+    return False
+
+def watch_ai(game, bot):
+    """Show the AI's best move so far until its search ends; /stop or Ctrl+C ends it now"""
+    shown = None
+    try:
+        while bot.is_thinking():
+            progress = bot.progress
+            if progress is not None and progress != shown:
+                depth, move, score = progress
+                piece_id, target, _ = game.decode(move)
+                print(f"\r  depth {depth}: {piece_id} to {game.square_to_str(*target)} ({format_score(score)})   ",
+                      end="", flush=True)
+                shown = progress
+            if stop_requested(0.1):
+                bot.stop_thinking()
+    except KeyboardInterrupt:
+        bot.stop_thinking()
+    if shown is not None:
+        print()
+
+def ai_turn(game):
+    """Let the AI play its move and report it"""
+    bot = game.ai_bot
+    print(f"\n{bot.name}: Let me think... (type /stop to make me move now)")
+    start_time = time.time()
+    bot.start_thinking(game, AI_MOVE_TIME)
+    watch_ai(game, bot)
+    best_move = bot.finish_thinking(game)
+    think_time = time.time() - start_time
+    if best_move is None:
+        print(f"{bot.name}: No legal moves.")
+        return
+    result = game.apply_move(best_move)
+    bot.start_pondering(game)
+    hit_str = ", ponder hit" if bot.ponder_hit else ""
+    print(f"{bot.name}: I'll move {result.piece} to {game.square_to_str(*result.target)} (thought for {think_time:.1f}s{hit_str})")
+    if result.promotion:
+        print(f"🤖 {bot.name}: I'll promote my pawn to a {PIECE_NAMES[result.promotion]}!")
+    show_board(game)
+
+def start_game(game):
+    """Show the board of a new game, letting the AI open if it plays White"""
+    show_board(game)
+    if game.vs_ai and game.to_move == game.ai_bot.side:
+        ai_turn(game)
+
+def print_search_stats(stats):
+    """Print the summary dict of a search"""
+    print(f"Depth: {stats['depth']}  Time: {stats['time']:.2f}s  "
+          f"Nodes: {stats['nodes']}  NPS: {stats['nps']:.0f}")
+    print(f"Beta cutoffs: {stats['beta_cutoffs']} ({stats['cutoff_rate']:.1%} of nodes, "
+          f"{stats['first_move_cutoff_rate']:.1%} on the first move)")
+    print(f"Hash table: {stats['tt_probes']} probes, {stats['tt_hits']} hits "
+          f"({stats['tt_hit_rate']:.1%}), {stats['tt_stores']} stores")
+    print(f"Pawn hash: {stats['pawn_probes']} probes, {stats['pawn_hits']} hits ({stats['pawn_hit_rate']:.1%})")
+    print(f"Calls: {stats['legal_move_calls']} legal_moves, {stats['evaluate_calls']} evaluate")
+    if stats.get("cache_hit"):
+        print("Result taken from the analysis cache.")
+    for it in stats["iterations"]:
+        print(f"  depth {it['depth']}: {it['time']:.2f}s, {it['nodes']} nodes")
+
+def print_lines(game, lines):
+    """Print MultiPV lines with their scores and SAN variations"""
+    from pgn import move_to_san
+    for i, (move, score, pv) in enumerate(lines, 1):
+        board = game.copy()
+        sans = []
+        for pv_move in pv:
+            pid, target, promotion = board.decode(pv_move)
+            sans.append(move_to_san(board, board.pieces[pid], target, promotion))
+            board.play_move(board.pieces[pid], target, promotion)
+        piece_id, target, _ = game.decode(move)
+        print(f"  {i}. {piece_id} to {game.square_to_str(*target)} ({format_score(score)}): {' '.join(sans)}")
+
+def stop_ai(game):
+    """Cancel any background search of the AI before the game is left"""
+    if game.vs_ai:
+        game.ai_bot.stop_pondering()
+
 def main():
     game = choose_game_mode()
     print("\nType /help for commands. Let's play chess! 🎯")
     
     # If AI plays first (as White)
-    if game.vs_ai and game.to_move == game.ai_bot.side:
-        game.show()
-        game.ai_bot.think_and_move(game)
-    else:
-        game.show()
+    start_game(game)
     
     while True:
         if game.game_over:
+            stop_ai(game)
             play_again = input("\nPlay again? (y/n): ").lower().strip()
             if play_again.startswith('y'):
                 game = choose_game_mode()
-                if game.vs_ai and game.to_move == game.ai_bot.side:
-                    game.show()
-                    game.ai_bot.think_and_move(game)
-                else:
-                    game.show()
+                start_game(game)
                 continue
             else:
                 print("Thanks for playing! 👋")
@@ -1022,23 +2115,21 @@ def main():
             continue
             
         if cmd.startswith("/show"):
-            game.show()
+            show_board(game)
             
         elif cmd.startswith("/help"):
             print(HELP)
             
         elif cmd.startswith("/newgame"):
+            stop_ai(game)
             game = ChessGame(vs_ai=False)
             print("Started new human vs human game!")
-            game.show()
+            show_board(game)
             
         elif cmd.startswith("/vs_ai"):
+            stop_ai(game)
             game = choose_game_mode()
-            if game.vs_ai and game.to_move == game.ai_bot.side:
-                game.show()
-                game.ai_bot.think_and_move(game)
-            else:
-                game.show()
+            start_game(game)
                 
         elif cmd.startswith("/status"):
             turn_str = 'White' if game.to_move == WHITE else 'Black'
@@ -1049,7 +2140,9 @@ def main():
                 print("Current player is in CHECK!")
             if game.vs_ai:
                 ai_side_str = 'White' if game.ai_bot.side == WHITE else 'Black'
-                print(f"AI is playing as: {ai_side_str} (difficulty {game.ai_bot.difficulty})")
+                bot = game.ai_bot
+                level_str = f"level {bot.level}, " if bot.level is not None else ""
+                print(f"AI is playing as: {ai_side_str} ({level_str}depth {bot.difficulty})")
                 
         elif cmd.startswith("/eval"):
             eval_score = game.evaluate_position()
@@ -1058,37 +2151,101 @@ def main():
             print(f"Black material: {game.get_material_value(BLACK)}")
             
         elif cmd.startswith("/hint") and game.vs_ai:
+            parts = cmd.split()
+            if len(parts) > 2 or (len(parts) == 2 and not parts[1].isdigit()):
+                print("Usage: /hint [N]")
+                continue
             if game.to_move != game.ai_bot.side:
                 print("🤖 ChessBot AI: Let me suggest a move for you...")
-                # Create temporary bot for player's side
-                temp_bot = ChessBot(game.to_move, 2)  # Lower depth for hints
-                best_move = temp_bot.get_best_move(game)
-                if best_move:
-                    piece_id, target = best_move
+                # The hint bot plays the player's side and keeps its hash table between hints
+                if game.hint_bot is None:
+                    game.hint_bot = ChessBot(game.to_move, 2)  # Lower depth for hints
+                lines = game.hint_bot.get_top_moves(game, max(1, int(parts[1])) if len(parts) == 2 else 1)
+                if len(lines) == 1:
+                    piece_id, target, _ = game.decode(lines[0][0])
                     target_str = game.square_to_str(*target)
                     print(f"🤖 ChessBot AI: I suggest moving {piece_id} to {target_str}")
+                elif lines:
+                    print("🤖 ChessBot AI: My top moves are:")
+                    print_lines(game, lines)
                 else:
                     print("🤖 ChessBot AI: I couldn't find a good move suggestion.")
             else:
                 print("🤖 ChessBot AI: It's my turn to move, no hints needed!")
                 
+        elif cmd.startswith("/ponder") and game.vs_ai:
+            parts = cmd.split()
+            if len(parts) == 2 and parts[1].lower() in ("on", "off"):
+                game.ai_bot.ponder = parts[1].lower() == "on"
+            elif len(parts) == 1:
+                game.ai_bot.ponder = not game.ai_bot.ponder
+            else:
+                print("Usage: /ponder [on|off]")
+                continue
+            if game.ai_bot.ponder:
+                print(f"🤖 {game.ai_bot.name}: I'll think about my reply while you think.")
+            else:
+                game.ai_bot.stop_pondering()
+                print(f"🤖 {game.ai_bot.name}: I'll only think on my own turn.")
+                
+        elif cmd.startswith("/stop") and game.vs_ai:
+            print(f"🤖 {game.ai_bot.name}: I'm not thinking about a move right now.")
+                
+        elif cmd.startswith("/stats") and game.vs_ai:
+            parts = cmd.split()
+            bot = game.ai_bot
+            if len(parts) == 2 and parts[1].lower() in ("on", "off"):
+                bot.collect_stats = parts[1].lower() == "on"
+                print(f"Search statistics {'enabled' if bot.collect_stats else 'disabled'}.")
+            elif len(parts) != 1:
+                print("Usage: /stats [on|off]")
+            elif bot.last_stats:
+                print_search_stats(bot.last_stats)
+            elif bot.collect_stats:
+                print("No search has finished yet.")
+            else:
+                print("Search statistics are off. Use /stats on to collect them.")
+                
+        elif cmd.startswith("/pgn"):
+            from pgn import game_to_pgn
+            parts = cmd.split(maxsplit=1)
+            text = game_to_pgn(game)
+            if len(parts) == 2:
+                with open(parts[1], "a") as f:
+                    f.write(text + "\n")
+                print(f"Game saved to {parts[1]}")
+            else:
+                print(text)
+                
+        elif cmd.startswith("/review"):
+            from review import DEFAULT_DEPTH, print_review, review_game
+            parts = cmd.split()
+            if len(parts) > 2 or (len(parts) == 2 and not parts[1].isdigit()):
+                print("Usage: /review [DEPTH]")
+                continue
+            if not game.game_state.move_history:
+                print("No moves to review yet.")
+                continue
+            depth = max(1, int(parts[1])) if len(parts) == 2 else DEFAULT_DEPTH
+            print(f"Reviewing {len(game.game_state.move_history)} moves at depth {depth}...")
+            print_review(review_game(game.start_fen, game.game_state.move_history, depth))
+                
         elif cmd.startswith("/surrender"):
             if game.vs_ai:
-                game.winner = game.ai_bot.side
+                game.resign(BLACK if game.ai_bot.side == WHITE else WHITE)
                 print(f"You surrendered. 🤖 {game.ai_bot.name}: Thanks for the game!")
             else:
                 current_player = 'White' if game.to_move == WHITE else 'Black'
                 print(f"{current_player} surrendered!")
-                game.winner = BLACK if game.to_move == WHITE else WHITE
-            game.game_over = True
-            game.show()
+                game.resign(game.to_move)
+            show_board(game)
             
         elif cmd.startswith("/discover"):
             parts = cmd.split()
             if len(parts) != 2:
                 print("Usage: /discover P1_W")
                 continue
-            game.discover(parts[1])
+            discover(game, parts[1])
             
         elif cmd.startswith("/move"):
             parts = cmd.split()
@@ -1101,9 +2258,10 @@ def main():
                 print(f"🤖 {game.ai_bot.name}: Wait, it's my turn!")
                 continue
                 
-            game.move(parts[1], parts[2])
+            human_move(game, parts[1], parts[2])
             
         elif cmd.startswith("/quit"):
+            stop_ai(game)
             print("Thanks for playing! 👋")
             break
             
@@ -1111,4 +2269,10 @@ def main():
             print("Unknown command. Use /help for available commands.")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        from bench import main as bench_main
+        sys.exit(bench_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "perft":
+        from perft import main as perft_main
+        sys.exit(perft_main(sys.argv[2:]))
     main()
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""Headless engine-vs-engine match runner.
+
+Plays games between two ChessBot configurations in parallel worker
+processes and reports W/D/L, the Elo difference with a 95% error bar and
+an SPRT verdict. Example:
+
+    python match_runner.py --engine-a '{"difficulty": 3}' \\
+        --engine-b '{"difficulty": 2}' --openings openings.fen --games 200 \\
+        --sprt 0 10
+
+Engine configurations are JSON objects of ChessBot keyword arguments plus
+an optional "time_limit" in seconds per move, or {"level": N} for one of
+the difficulty levels in SKILL_LEVELS. The openings file holds one
+FEN per line; blank lines and lines starting with '#' are ignored. Each
+opening is played twice with colours swapped.
+"""
+import argparse
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from example import ChessBot, ChessGame, WHITE, BLACK, bot_for_level
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+DEFAULT_MAX_PLIES = 300
+
+def load_openings(path):
+    """Read FEN positions, one per line"""
+    if path is None:
+        return [START_FEN]
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                openings.append(line)
+    if not openings:
+        raise ValueError(f"No positions in {path}")
+    return openings
+
+def make_bot(side, config):
+    """Build a bot from a configuration dict and return it with its time limit"""
+    options = dict(config)
+    time_limit = options.pop("time_limit", None)
+    options.pop("name", None)
+    level = options.pop("level", None)
+    if level is not None:
+        return bot_for_level(side, level, collect_stats=True, **options), time_limit
+    return ChessBot(side, collect_stats=True, **options), time_limit
+
+def play_game(fen, white_config, black_config, max_plies=DEFAULT_MAX_PLIES):
+    """Play one game
+
+    Returns the result from White's point of view (1, 0.5 or 0) and the
+    per-side totals of moves, search nodes and thinking time.
+    """
+    game = ChessGame()
+    game.load_fen(fen)
+    game.check_game_over()
+    bots = {WHITE: make_bot(WHITE, white_config), BLACK: make_bot(BLACK, black_config)}
+    totals = {WHITE: [0, 0, 0.0], BLACK: [0, 0, 0.0]}  # moves, nodes, seconds
+    seen = {}
+    plies = 0
+
+    while not game.game_over and plies < max_plies:
+        key = game.position_key()
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] >= 3:
+            break  # Threefold repetition
+
+        side = game.to_move
+        bot, time_limit = bots[side]
+        start = time.time()
+        best_move = bot.get_best_move(game, time_limit=time_limit)
+        elapsed = time.time() - start
+        if best_move is None:
+            break
+        totals[side][0] += 1
+        totals[side][1] += bot.last_stats["nodes"]
+        totals[side][2] += elapsed
+
+        fen_before = game.fen()
+        result = game.apply_move(best_move)
+        if not result.ok:
+            raise RuntimeError(f"Engine played an illegal move {game.decode(best_move)} in {fen_before}: {result.error}")
+        plies += 1
+
+    if game.game_over and game.winner == WHITE:
+        result = 1.0
+    elif game.game_over and game.winner == BLACK:
+        result = 0.0
+    else:
+        result = 0.5
+    return result, totals
+
+def _play_pair_game(index, fen, config_a, config_b, a_is_white, max_plies):
+    white, black = (config_a, config_b) if a_is_white else (config_b, config_a)
+    result, totals = play_game(fen, white, black, max_plies)
+    a_side, b_side = (WHITE, BLACK) if a_is_white else (BLACK, WHITE)
+    return {
+        "index": index,
+        "score": result if a_is_white else 1.0 - result,
+        "a": totals[a_side],
+        "b": totals[b_side],
+    }
+
+# ========================
+# Statistics
+# ========================
+PSEUDO_COUNT = 0.5  # Wins and losses added to keep the score variance above 0
+
+def score_to_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+def elo_to_score(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+def score_variance(wins, draws, losses, score):
+    """Per-game variance of the score, never 0
+
+    Half a win and half a loss are added as pseudo-counts. They score like
+    one draw, but they keep the variance above 0 even for a run of
+    identical results, so the error bar stays finite and the SPRT can
+    still reach a verdict.
+    """
+    wins += PSEUDO_COUNT
+    losses += PSEUDO_COUNT
+    n = wins + draws + losses
+    return (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+
+def elo_estimate(wins, draws, losses):
+    """Elo difference and the half-width of its 95% confidence interval"""
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, float("inf")
+    score = (wins + 0.5 * draws) / n
+    variance = score_variance(wins, draws, losses, score)
+    margin = 1.96 * math.sqrt(variance / n)
+    low, high = score_to_elo(score - margin), score_to_elo(score + margin)
+    return score_to_elo(score), (high - low) / 2
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """Log-likelihood ratio of H1 (elo1) against H0 (elo0), normal approximation"""
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0
+    score = (wins + 0.5 * draws) / n
+    variance = score_variance(wins, draws, losses, score)
+    s0, s1 = elo_to_score(elo0), elo_to_score(elo1)
+    return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+class MatchResult:
+    def __init__(self, sprt=None, alpha=0.05, beta=0.05):
+        self.wins = self.draws = self.losses = 0
+        self.a_totals = [0, 0, 0.0]
+        self.b_totals = [0, 0, 0.0]
+        self.sprt = sprt
+        self.bounds = sprt_bounds(alpha, beta)
+        self.verdict = None
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, game):
+        if game["score"] == 1.0:
+            self.wins += 1
+        elif game["score"] == 0.0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        for totals, new in ((self.a_totals, game["a"]), (self.b_totals, game["b"])):
+            for i, value in enumerate(new):
+                totals[i] += value
+        if self.sprt:
+            llr = self.llr()
+            if llr <= self.bounds[0]:
+                self.verdict = "H0 accepted"
+            elif llr >= self.bounds[1]:
+                self.verdict = "H1 accepted"
+
+    def llr(self):
+        return sprt_llr(self.wins, self.draws, self.losses, *self.sprt) if self.sprt else 0.0
+
+    def as_dict(self):
+        elo, margin = elo_estimate(self.wins, self.draws, self.losses)
+        def per_move(totals):
+            moves = totals[0] or 1
+            return {"moves": totals[0], "nodes_per_move": totals[1] / moves,
+                    "time_per_move": totals[2] / moves}
+        report = {
+            "games": self.games, "wins": self.wins, "draws": self.draws, "losses": self.losses,
+            "elo": elo, "elo_margin": margin,
+            "engine_a": per_move(self.a_totals), "engine_b": per_move(self.b_totals),
+        }
+        if self.sprt:
+            report["sprt"] = {"elo0": self.sprt[0], "elo1": self.sprt[1], "llr": self.llr(),
+                              "bounds": list(self.bounds), "verdict": self.verdict}
+        return report
+
+def run_match(config_a, config_b, openings, games, workers=None, sprt=None,
+              alpha=0.05, beta=0.05, max_plies=DEFAULT_MAX_PLIES, progress=None):
+    """Play up to `games` games, stopping early once the SPRT reaches a verdict"""
+    match = MatchResult(sprt, alpha, beta)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for i in range(games):
+            fen = openings[(i // 2) % len(openings)]
+            futures.append(pool.submit(_play_pair_game, i, fen, config_a, config_b,
+                                       i % 2 == 0, max_plies))
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            match.add(future.result())
+            if progress:
+                progress(match)
+            if match.verdict:
+                for pending in futures:
+                    pending.cancel()
+                break
+    return match
+
+def print_report(report):
+    print(f"Games: {report['games']}  W/D/L: {report['wins']}/{report['draws']}/{report['losses']}")
+    print(f"Elo difference: {report['elo']:+.1f} +/- {report['elo_margin']:.1f}")
+    for name in ("engine_a", "engine_b"):
+        stats = report[name]
+        print(f"{name}: {stats['nodes_per_move']:.0f} nodes/move, {stats['time_per_move']:.2f}s/move")
+    if "sprt" in report:
+        sprt = report["sprt"]
+        print(f"SPRT [{sprt['elo0']}, {sprt['elo1']}]: LLR {sprt['llr']:.2f} "
+              f"({sprt['bounds'][0]:.2f}, {sprt['bounds'][1]:.2f}) -> {sprt['verdict'] or 'inconclusive'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play ChessBot configurations against each other")
+    parser.add_argument("--engine-a", default='{"difficulty": 3}', help="JSON ChessBot options")
+    parser.add_argument("--engine-b", default='{"difficulty": 3}', help="JSON ChessBot options")
+    parser.add_argument("--openings", help="file with one FEN per line (default: start position)")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="parallel games (default: CPU count)")
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES, help="adjudicate a draw after this many plies")
+    parser.add_argument("--sprt", nargs=2, type=float, metavar=("ELO0", "ELO1"), help="run an SPRT between two Elo hypotheses")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    def progress(match):
+        if not args.json:
+            print(f"\r{match.games}/{args.games} games, W/D/L {match.wins}/{match.draws}/{match.losses}",
+                  end="", flush=True)
+
+    match = run_match(json.loads(args.engine_a), json.loads(args.engine_b),
+                      load_openings(args.openings), args.games, args.workers,
+                      tuple(args.sprt) if args.sprt else None, args.alpha, args.beta,
+                      args.max_plies, progress)
+    report = match.as_dict()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print()
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Perft check of the move generator against reference node counts.
+
+    python perft.py                 # all positions to depth 3
+    python perft.py --depth 2       # quicker
+    python example.py perft ...     # same, from the game CLI
+
+Perft counts the leaf nodes of the full legal move tree to a fixed depth.
+The counts of the standard test positions are known, so any bug in
+generate_moves, is_legal, make_move/unmake_move or load_fen changes them.
+Every unmake is also checked to restore the position, pawn and material
+keys that the search and evaluation rely on. The exit status is 1 on a
+mismatch, so the check can gate CI.
+"""
+import argparse
+import sys
+import time
+
+from example import ChessGame, MoveList
+
+DEFAULT_DEPTH = 3
+# (name, FEN, leaf counts at depth 1, 2, 3)
+PERFT_POSITIONS = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", (20, 400, 8902)),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", (48, 2039, 97862)),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", (14, 191, 2812)),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", (6, 264, 9467)),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", (44, 1486, 62379)),
+]
+
+class PerftError(Exception):
+    """An unmake_move that did not restore the position"""
+
+def perft(game, depth, move_lists=None):
+    """Number of leaf nodes of the legal move tree `depth` plies deep"""
+    if depth == 0:
+        return 1
+    if move_lists is None:
+        move_lists = [MoveList() for _ in range(depth + 1)]
+    move_list = move_lists[depth]
+    game.generate_moves(move_list)
+    keys = (game.position_key(), game.pawn_key, game.material_key)
+    nodes = 0
+    for move in list(move_list):
+        if not game.is_legal(move):
+            continue
+        undo = game.make_move(move)
+        nodes += perft(game, depth - 1, move_lists)
+        game.unmake_move(move, undo)
+        if (game.position_key(), game.pawn_key, game.material_key) != keys:
+            raise PerftError(f"unmake of {game.decode(move)} changed the keys of {game.fen()}")
+    return nodes
+
+def run_perft(depth=DEFAULT_DEPTH, progress=None):
+    """Check every position; returns (name, depth, nodes, expected) rows and whether all match"""
+    rows, ok = [], True
+    for name, fen, counts in PERFT_POSITIONS:
+        game = ChessGame()
+        game.load_fen(fen)
+        for d in range(1, min(depth, len(counts)) + 1):
+            if progress:
+                progress(name, d)
+            try:
+                nodes = perft(game, d)
+            except PerftError as e:
+                nodes = str(e)
+            rows.append((name, d, nodes, counts[d - 1]))
+            ok = ok and nodes == counts[d - 1]
+    return rows, ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="perft", description="Check the move generator against perft counts")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="deepest perft depth, 1 to 3")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    rows, ok = run_perft(args.depth)
+    for name, depth, nodes, expected in rows:
+        verdict = "ok" if nodes == expected else f"FAIL, expected {expected}"
+        print(f"{name:<12} depth {depth}: {nodes}  {verdict}")
+    print(f"{'All counts match' if ok else 'Perft mismatch'} ({time.time() - start:.1f}s)")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
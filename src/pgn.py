@@ -0,0 +1,266 @@
+"""SAN move notation and streaming PGN reading and writing.
+
+    with open("games.pgn") as f:
+        for pgn_game in iter_pgn(f):
+            game = replay(pgn_game)
+
+iter_pgn() reads one line at a time, so files of any size can be
+processed with constant memory. replay() checks every move with the
+legal-move generator and applies it without console output.
+"""
+import re
+
+from example import ChessGame, FILES, RANKS, WHITE
+
+SAN_RE = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$")
+TAG_RE = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN_RE = re.compile(r"\{[^}]*\}?|;.*|\(|\)|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.(?:\.\.)?|[^\s{}();$]+")
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+CASTLING_SAN = {"O-O": 2, "0-0": 2, "O-O-O": -2, "0-0-0": -2}
+SEVEN_TAG_ROSTER = (("Event", "?"), ("Site", "?"), ("Date", "????.??.??"), ("Round", "?"),
+                    ("White", "?"), ("Black", "?"), ("Result", "*"))
+
+class PgnError(ValueError):
+    """Raised for malformed PGN or illegal moves"""
+
+class PgnGame:
+    def __init__(self, headers, moves, result):
+        self.headers = headers  # Tag name -> value
+        self.moves = moves      # SAN strings
+        self.result = result
+
+    def __repr__(self):
+        return f"PgnGame({self.headers.get('White', '?')} - {self.headers.get('Black', '?')}, {len(self.moves)} plies, {self.result})"
+
+# ========================
+# SAN
+# ========================
+def _can_move(game, piece, target):
+    return target in game.get_pseudo_legal_moves(piece) and game.is_legal_move(piece, target)
+
+def parse_san(game, san):
+    """Find the legal move a SAN string refers to
+
+    Returns (piece, target, promotion) for the side to move, or raises
+    PgnError if the move is malformed, illegal or ambiguous.
+    """
+    text = san.rstrip("+#!?")
+    side = game.to_move
+    if text in CASTLING_SAN:
+        king = game.pieces.get(f"K{side}")
+        if king is None or not king.alive:
+            raise PgnError(f"Illegal move {san}")
+        target = (king.x + CASTLING_SAN[text], king.y)
+        if not (0 <= target[0] < 8 and _can_move(game, king, target)):
+            raise PgnError(f"Illegal move {san}")
+        return king, target, None
+
+    m = SAN_RE.match(text)
+    if not m:
+        raise PgnError(f"Invalid SAN move {san!r}")
+    ptype = m.group(1) or "P"
+    from_x = FILES.index(m.group(2).upper()) if m.group(2) else None
+    from_y = RANKS.index(m.group(3)) if m.group(3) else None
+    target = game.parse_square(m.group(5))
+    promotion = m.group(6)
+
+    candidates = []
+    for piece in game.pieces.values():
+        if (piece.alive and piece.side == side and piece.ptype == ptype
+                and (from_x is None or piece.x == from_x)
+                and (from_y is None or piece.y == from_y)
+                and _can_move(game, piece, target)):
+            candidates.append(piece)
+    if not candidates:
+        raise PgnError(f"Illegal move {san}")
+    if len(candidates) > 1:
+        raise PgnError(f"Ambiguous move {san}")
+
+    piece = candidates[0]
+    if (ptype == "P" and target[1] in (0, 7)) != bool(promotion):
+        raise PgnError(f"Missing or unexpected promotion in {san}")
+    return piece, target, promotion
+
+def move_to_san(game, piece, target, promotion=None):
+    """SAN string for a legal move of `piece` in the current position"""
+    tx, ty = target
+    if piece.ptype == "K" and abs(tx - piece.x) == 2:
+        san = "O-O" if tx > piece.x else "O-O-O"
+    else:
+        square = game.square_to_str(tx, ty).lower()
+        capture = game.board[tx][ty] is not None or (
+            piece.ptype == "P" and target == game.game_state.en_passant_target)
+        if piece.ptype == "P":
+            san = (FILES[piece.x].lower() + "x" if capture else "") + square
+            if ty in (0, 7):
+                san += "=" + (promotion or "Q").upper()
+        else:
+            others = [p for p in game.pieces.values()
+                      if p is not piece and p.alive and p.side == piece.side
+                      and p.ptype == piece.ptype and _can_move(game, p, target)]
+            disambiguation = ""
+            if others:
+                if all(p.x != piece.x for p in others):
+                    disambiguation = FILES[piece.x].lower()
+                elif all(p.y != piece.y for p in others):
+                    disambiguation = RANKS[piece.y]
+                else:
+                    disambiguation = game.square_to_str(piece.x, piece.y).lower()
+            san = piece.ptype + disambiguation + ("x" if capture else "") + square
+
+    after = game.copy()
+    after.play_move(after.pieces[piece.id], target, promotion)
+    if after.is_in_check(after.to_move):
+        has_moves = any(p.alive and p.side == after.to_move and after.legal_moves(p)
+                        for p in list(after.pieces.values()))
+        san += "+" if has_moves else "#"
+    return san
+
+def play_san(game, san):
+    """Apply a SAN move to the game, without console output"""
+    piece, target, promotion = parse_san(game, san)
+    game.play_move(piece, target, promotion)
+
+def replay(pgn_game):
+    """Replay a PgnGame from its start position, validating every move
+
+    Returns the ChessGame after the last move.
+    """
+    game = ChessGame()
+    if "FEN" in pgn_game.headers:
+        game.load_fen(pgn_game.headers["FEN"])
+    for ply, san in enumerate(pgn_game.moves):
+        try:
+            play_san(game, san)
+        except PgnError as e:
+            raise PgnError(f"{e} at ply {ply + 1}") from None
+    return game
+
+# ========================
+# PGN reading
+# ========================
+def _unescape(value):
+    return value.replace('\\"', '"').replace("\\\\", "\\")
+
+def iter_pgn(stream):
+    """Yield the games of a PGN text stream one at a time"""
+    headers, moves = {}, []
+    in_comment = False
+    variation_depth = 0
+
+    for raw_line in stream:
+        line = raw_line.strip()
+        if in_comment:
+            end = line.find("}")
+            if end < 0:
+                continue
+            line = line[end + 1:].strip()
+            in_comment = False
+        if not line or line.startswith("%"):
+            continue
+
+        if line.startswith("[") and variation_depth == 0:
+            m = TAG_RE.match(line)
+            if m:
+                if moves:  # Previous game ended without a result token
+                    yield PgnGame(headers, moves, headers.get("Result", "*"))
+                    headers, moves = {}, []
+                headers[m.group(1)] = _unescape(m.group(2))
+                continue
+
+        for token in TOKEN_RE.findall(line):
+            first = token[0]
+            if first == "{":
+                in_comment = not token.endswith("}")
+            elif first == ";" or first == "$":
+                continue
+            elif token == "(":
+                variation_depth += 1
+            elif token == ")":
+                variation_depth = max(0, variation_depth - 1)
+            elif variation_depth:
+                continue
+            elif token in RESULTS:
+                yield PgnGame(headers, moves, token)
+                headers, moves = {}, []
+            elif first.isdigit() and token.endswith("."):
+                continue  # Move number
+            else:
+                moves.append(token)
+
+    if moves or headers:
+        yield PgnGame(headers, moves, headers.get("Result", "*"))
+
+def read_pgn(path):
+    """Yield the games of a PGN file"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        yield from iter_pgn(f)
+
+# ========================
+# PGN writing
+# ========================
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def game_result(game):
+    if not game.game_over:
+        return "*"
+    if game.winner == WHITE:
+        return "1-0"
+    if game.winner is None:
+        return "1/2-1/2"
+    return "0-1"
+
+def format_pgn(headers, moves, result, start_fen=None):
+    """PGN text for a list of SAN moves"""
+    tags = dict(SEVEN_TAG_ROSTER)
+    tags.update(headers)
+    tags["Result"] = result
+    tags.pop("SetUp", None)
+    tags.pop("FEN", None)
+    if start_fen:
+        tags["SetUp"] = "1"
+        tags["FEN"] = start_fen
+    lines = [f'[{name} "{_escape(str(value))}"]' for name, value in tags.items()]
+    lines.append("")
+
+    move_number, black_to_move = 1, False
+    if start_fen:
+        fields = start_fen.split()
+        black_to_move = fields[1] == "b"
+        if len(fields) >= 6:
+            move_number = int(fields[5])
+    tokens = []
+    for i, san in enumerate(moves):
+        if not black_to_move:
+            tokens.append(f"{move_number}.")
+        elif i == 0:
+            tokens.append(f"{move_number}...")
+        tokens.append(san)
+        if black_to_move:
+            move_number += 1
+        black_to_move = not black_to_move
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+def game_to_pgn(game, headers=None, result=None):
+    """PGN text for a ChessGame, rebuilt from its move history"""
+    board = ChessGame()
+    if game.start_fen:
+        board.load_fen(game.start_fen)
+    moves = []
+    for move in game.game_state.move_history:
+        pid, target, promotion = board.decode(move)
+        piece = board.pieces[pid]
+        moves.append(move_to_san(board, piece, target, promotion))
+        board.play_move(piece, target, promotion)
+    return format_pgn(headers or {}, moves, result or game_result(game), game.start_fen)
@@ -0,0 +1,211 @@
+"""Whole-game review: evaluation, best move and centipawn loss for every move.
+
+    python review.py games.pgn                 # review every game of a PGN file
+    python review.py games.pgn --depth 3 --json
+    /review                                    # in the game CLI, for the current game
+
+Every position of the game is searched by a ChessBot playing White, so all
+scores share one point of view and one hash table per worker. A worker
+takes a contiguous chunk of the game and searches it from the last
+position back to the first. The tree of an earlier position contains the
+later ones, so its search finds their results in the hash table instead
+of searching them again. Chunks run in parallel processes when more than
+one core is free.
+
+Each iteration of a position's search scores the move played on its own
+before searching for the best move (ChessBot.analyse_move), so both
+scores come from the same search, depth and hash table. The subtree of
+the move played is the position searched just before, which the hash
+table mostly answers. When the node limit stops a search before depth 1
+finishes, the loss of that move is unknown and left out of the averages.
+
+Centipawn loss is how much worse the played move scores than the best
+move for the side that moved, with scores capped at LOSS_CAP so a missed
+mate counts like a lost piece rather than 30000.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from example import ChessBot, ChessGame, MATE_SCORE, WHITE, format_score
+from pgn import move_to_san, read_pgn, replay
+
+DEFAULT_DEPTH = 2
+LOSS_CAP = 1000
+# Centipawn loss from which a move is labelled, checked from the top
+LABELS = ((300, "blunder"), (100, "mistake"), (50, "inaccuracy"))
+
+# ========================
+# Analysis
+# ========================
+def _positions(start_fen, moves, first, last):
+    """Copies of the positions before moves first..last (last may be len(moves))"""
+    board = ChessGame()
+    if start_fen:
+        board.load_fen(start_fen)
+    positions = []
+    for i in range(last + 1):
+        if i >= first:
+            positions.append(board.copy())
+        if i < len(moves):
+            board.make_move(moves[i])
+    return positions
+
+def _terminal_score(game):
+    """Score for White of a position without legal moves"""
+    if not game.is_in_check(game.to_move):
+        return 0
+    return -MATE_SCORE if game.to_move == WHITE else MATE_SCORE
+
+def review_chunk(start_fen, moves, first, last, depth=DEFAULT_DEPTH, node_limit=None):
+    """Search positions first..last, latest first, with one bot and hash table
+
+    Returns (index, best move, score for White, pv, score of the move
+    played) per position. The last score is None after the last move or
+    when no iteration of the search finished.
+    """
+    bot = ChessBot(WHITE, depth, node_limit=node_limit)
+    results = []
+    for offset, game in reversed(list(enumerate(_positions(start_fen, moves, first, last)))):
+        index = first + offset
+        if index < len(moves):
+            best_move, score, played_score = bot.analyse_move(game, moves[index])
+        else:
+            best_move, played_score = bot.get_best_move(game), None
+            score = bot.lines[0][1] if best_move is not None else None
+        if best_move is None:
+            results.append((index, None, _terminal_score(game), [], None))
+        else:
+            results.append((index, best_move, score, list(bot.pv), played_score))
+    return results
+
+def _chunks(count, parts):
+    """Split range(count) into `parts` contiguous (first, last) ranges"""
+    size, extra = divmod(count, parts)
+    ranges, first = [], 0
+    for i in range(parts):
+        last = first + size + (1 if i < extra else 0) - 1
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+def analyse_positions(start_fen, moves, depth=DEFAULT_DEPTH, node_limit=None, workers=None):
+    """Search every position of the game
+
+    Returns (best move, score, pv, score of the move played) per position.
+    """
+    count = len(moves) + 1
+    workers = max(1, min(workers or os.cpu_count() or 1, count))
+    if workers == 1:
+        results = review_chunk(start_fen, moves, 0, count - 1, depth, node_limit)
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(review_chunk, start_fen, moves, first, last, depth, node_limit)
+                       for first, last in _chunks(count, workers)]
+            for future in futures:
+                results.extend(future.result())
+    analysis = [None] * count
+    for index, best_move, score, pv, played_score in results:
+        analysis[index] = (best_move, score, pv, played_score)
+    return analysis
+
+def _capped(score):
+    return max(-LOSS_CAP, min(LOSS_CAP, score if score is not None else 0))
+
+def review_game(start_fen, moves, depth=DEFAULT_DEPTH, node_limit=None, workers=None):
+    """Review a game given as its start FEN (None for the standard start) and packed moves
+
+    Returns a dict with one entry per move (SAN played and best, scores for
+    White before and after, centipawn loss and label) and the average
+    centipawn loss per side. The loss is None for a move whose search hit
+    the node limit before finishing depth 1; the averages leave it out.
+    """
+    moves = list(moves)
+    analysis = analyse_positions(start_fen, moves, depth, node_limit, workers)
+    board = ChessGame()
+    if start_fen:
+        board.load_fen(start_fen)
+    entries = []
+    losses = {"white": [], "black": []}
+    for ply, move in enumerate(moves):
+        best_move, best_score, best_pv, played_score = analysis[ply]
+        side = "white" if board.to_move == WHITE else "black"
+        sign = 1 if board.to_move == WHITE else -1
+        if played_score is None or best_score is None:
+            loss = None  # The search stopped before scoring the move
+        elif move == best_move:
+            loss = 0
+        else:
+            loss = max(0, sign * (_capped(best_score) - _capped(played_score)))
+        label = next((name for threshold, name in LABELS if loss >= threshold), None) if loss is not None else None
+
+        best_san = None
+        if best_move is not None:
+            pid, target, promotion = board.decode(best_move)
+            best_san = move_to_san(board, board.pieces[pid], target, promotion)
+        pid, target, promotion = board.decode(move)
+        san = move_to_san(board, board.pieces[pid], target, promotion)
+        entries.append({
+            "ply": ply + 1,
+            "move_number": board.game_state.fullmove_number,
+            "side": side,
+            "move": san,
+            "best": best_san,
+            "eval_before": best_score,
+            "eval_after": played_score,
+            "cp_loss": loss,
+            "label": label,
+        })
+        if loss is not None:
+            losses[side].append(loss)
+        board.play_move(board.pieces[pid], target, promotion)
+    return {
+        "depth": depth,
+        "moves": entries,
+        "average_cp_loss": {side: sum(values) / len(values) if values else 0.0
+                            for side, values in losses.items()},
+    }
+
+# ========================
+# Output
+# ========================
+def print_review(review):
+    print(f"{'move':<12}{'played':<10}{'best':<10}{'eval':>8}{'loss':>7}")
+    for entry in review["moves"]:
+        number = f"{entry['move_number']}." if entry["side"] == "white" else f"{entry['move_number']}..."
+        best = "" if entry["cp_loss"] == 0 else entry["best"] or ""
+        loss = "?" if entry["cp_loss"] is None else f"{entry['cp_loss']:.0f}"
+        label = f"  {entry['label']}" if entry["label"] else ""
+        print(f"{number:<12}{entry['move']:<10}{best:<10}{format_score(entry['eval_after']):>8}"
+              f"{loss:>7}{label}")
+    average = review["average_cp_loss"]
+    print(f"Average centipawn loss: White {average['white']:.0f}, Black {average['black']:.0f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="review", description="Review the moves of finished games")
+    parser.add_argument("pgn", help="PGN file with the games to review")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="search depth per position")
+    parser.add_argument("--nodes", type=int, default=None, help="node limit per position")
+    parser.add_argument("--workers", type=int, default=None, help="parallel processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="print the reviews as JSON")
+    args = parser.parse_args(argv)
+
+    reviews = []
+    for pgn_game in read_pgn(args.pgn):
+        game = replay(pgn_game)
+        review = review_game(game.start_fen, game.game_state.move_history, args.depth, args.nodes, args.workers)
+        review["headers"] = pgn_game.headers
+        reviews.append(review)
+        if not args.json:
+            print(f"\n{pgn_game.headers.get('White', '?')} - {pgn_game.headers.get('Black', '?')} "
+                  f"{pgn_game.result}")
+            print_review(review)
+    if args.json:
+        print(json.dumps(reviews, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
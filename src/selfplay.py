@@ -0,0 +1,270 @@
+"""Parallel self-play generator writing fixed-record binary shards.
+
+    python selfplay.py --games 1000 --depth 2 --out data/ --workers 8
+
+Every game starts from a randomised opening: a few random legal moves,
+played from the start position or from a FEN of an --openings file.
+After that, ChessBot plays both sides. Each position the engine searched
+is stored with its search score, best move and the final game result.
+
+Shards are flat files: a HEADER_SIZE byte header followed by RECORD.size
+byte records, so they can be memory-mapped (see memmap_shard) or read
+with read_shard(). A record holds:
+
+    board      32 bytes  64 squares a1..h8, 4 bits each (low nibble first):
+                         0 empty, 1-6 white PNBRQK, 9-14 black pnbrqk
+    flags      uint8     bit 0 black to move, bits 1-4 castling KQkq,
+                         bit 5 side to move in check
+    ep_file    uint8     en passant file + 1, 0 for none
+    halfmove   uint8     halfmove clock, capped at 255
+    result     int8      game result for White: 1, 0 or -1
+    score      int16     search score for White in centipawns, clamped
+    move       uint16    best move, packed as in example.py
+    ply        uint16    ply of the game
+
+Workers return whole games as bytes, and the parent appends them to
+the current shard as they finish. Only a bounded number of games are in
+flight at once, so memory stays flat however many games are played.
+"""
+import argparse
+import os
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from example import ChessBot, ChessGame, MoveList, CASTLING_PIECES, WHITE, BLACK
+from match_runner import load_openings
+
+MAGIC = b"OBSP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHQ")  # magic, version, record size, reserved
+HEADER_SIZE = 16
+RECORD = struct.Struct("<32sBBBbhHH")
+SCORE_LIMIT = 32000
+PIECE_CODES = {ptype: i + 1 for i, ptype in enumerate("PNBRQK")}
+PIECE_LETTERS = {code: ptype for ptype, code in PIECE_CODES.items()}
+BLACK_CODE = 8
+DEFAULT_RECORDS_PER_SHARD = 1 << 20
+
+# ========================
+# Position encoding
+# ========================
+def encode_position(game):
+    """Packed board, flags, en passant file and halfmove clock of a position"""
+    nibbles = [0] * 64
+    for piece in game.pieces.values():
+        if piece.alive:
+            code = PIECE_CODES[piece.ptype]
+            nibbles[piece.y * 8 + piece.x] = code | BLACK_CODE if piece.side == BLACK else code
+    board = bytes(nibbles[i] | nibbles[i + 1] << 4 for i in range(0, 64, 2))
+
+    flags = 1 if game.to_move == BLACK else 0
+    for bit, (right, (king_id, rook_id)) in enumerate(CASTLING_PIECES.items()):
+        king, rook = game.pieces.get(king_id), game.pieces.get(rook_id)
+        if king and rook and king.alive and rook.alive and not king.moved and not rook.moved:
+            flags |= 2 << bit
+    if game.is_in_check(game.to_move):
+        flags |= 32
+    ep = game.game_state.en_passant_target
+    return board, flags, ep[0] + 1 if ep else 0, min(game.game_state.halfmove_clock, 255)
+
+def record_to_fen(record):
+    """FEN of a decoded record tuple (see RECORD)"""
+    board, flags, ep_file = record[0], record[1], record[2]
+    rows = []
+    for y in range(7, -1, -1):
+        row, empty = "", 0
+        for x in range(8):
+            i = y * 8 + x
+            code = board[i >> 1] >> 4 if i & 1 else board[i >> 1] & 15
+            if not code:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            letter = PIECE_LETTERS[code & 7]
+            row += letter.lower() if code & BLACK_CODE else letter
+        rows.append(row + (str(empty) if empty else ""))
+    castling = "".join(c for bit, c in enumerate("KQkq") if flags & (2 << bit)) or "-"
+    side = "b" if flags & 1 else "w"
+    ep = "-"
+    if ep_file:
+        ep = "abcdefgh"[ep_file - 1] + ("3" if side == "b" else "6")
+    return f"{'/'.join(rows)} {side} {castling} {ep} {record[3]} 1"
+
+# ========================
+# Worker process side
+# ========================
+def play_selfplay_game(seed, depth, random_plies, max_plies, opening_fen=None):
+    """Play one self-play game and return its records as bytes"""
+    rng = random.Random(seed)
+    game = ChessGame()
+    if opening_fen:
+        game.load_fen(opening_fen)
+    move_list = MoveList()
+    for _ in range(random_plies):
+        game.generate_moves(move_list)
+        legal = [move for move in move_list if game.is_legal(move)]
+        if not legal:
+            break
+        game.apply_move(rng.choice(legal))
+    game.check_game_over()
+
+    bots = {WHITE: ChessBot(WHITE, depth), BLACK: ChessBot(BLACK, depth)}
+    positions = []
+    seen = {}
+    ply = 0
+    while not game.game_over and ply < max_plies:
+        key = game.position_key()
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] >= 3:
+            break  # Threefold repetition
+        bot = bots[game.to_move]
+        best_move = bot.get_best_move(game)
+        if best_move is None:
+            break
+        score = bot.lines[0][1] if bot.lines else 0
+        score = max(-SCORE_LIMIT, min(SCORE_LIMIT, int(score if score is not None else 0)))
+        if game.to_move == BLACK:
+            score = -score
+        positions.append((encode_position(game), score, best_move, ply))
+        game.apply_move(best_move)
+        ply += 1
+
+    result = 0
+    if game.game_over and game.winner == WHITE:
+        result = 1
+    elif game.game_over and game.winner == BLACK:
+        result = -1
+    return b"".join(RECORD.pack(board, flags, ep_file, halfmove, result, score, move, ply)
+                    for (board, flags, ep_file, halfmove), score, move, ply in positions)
+
+# ========================
+# Shards
+# ========================
+class ShardWriter:
+    """Append records to numbered shard files, starting a new one when full"""
+    def __init__(self, directory, prefix="selfplay", records_per_shard=DEFAULT_RECORDS_PER_SHARD):
+        self.directory = directory
+        self.prefix = prefix
+        self.records_per_shard = records_per_shard
+        self.records = 0
+        self.paths = []
+        self._file = None
+        self._shard_records = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_next(self):
+        if self._file:
+            self._file.close()
+        n = 0
+        while True:
+            path = os.path.join(self.directory, f"{self.prefix}-{n:05d}.bin")
+            if not os.path.exists(path):
+                break
+            n += 1
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, 0))
+        self._shard_records = 0
+        self.paths.append(path)
+
+    def write(self, data):
+        """Write packed records, splitting them across shards as needed"""
+        offset = 0
+        while offset < len(data):
+            if self._file is None or self._shard_records >= self.records_per_shard:
+                self._open_next()
+            count = min(self.records_per_shard - self._shard_records, (len(data) - offset) // RECORD.size)
+            self._file.write(data[offset:offset + count * RECORD.size])
+            offset += count * RECORD.size
+            self._shard_records += count
+            self.records += count
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def _check_header(header, path):
+    magic, version, record_size, _ = HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} self-play shard")
+
+def read_shard(path):
+    """Yield the records of a shard as tuples (see RECORD)"""
+    with open(path, "rb") as f:
+        _check_header(f.read(HEADER_SIZE), path)
+        while True:
+            chunk = f.read(RECORD.size * 4096)
+            if not chunk:
+                break
+            yield from RECORD.iter_unpack(chunk)
+
+def memmap_shard(path):
+    """Memory-map a shard as a numpy record array (needs numpy)"""
+    import numpy as np
+    with open(path, "rb") as f:
+        _check_header(f.read(HEADER_SIZE), path)
+    dtype = np.dtype([("board", "V32"), ("flags", "u1"), ("ep_file", "u1"), ("halfmove", "u1"),
+                      ("result", "i1"), ("score", "<i2"), ("move", "<u2"), ("ply", "<u2")])
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE)
+
+# ========================
+# Generator
+# ========================
+def generate(out_dir, games, depth=2, random_plies=8, max_plies=200, workers=None, openings=None,
+             seed=0, records_per_shard=DEFAULT_RECORDS_PER_SHARD, progress=None):
+    """Play `games` self-play games in parallel and write their positions to shards"""
+    writer = ShardWriter(out_dir, records_per_shard=records_per_shard)
+    openings = openings or [None]
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+    started = finished = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            while finished < games:
+                while started < games and len(pending) < max_in_flight:
+                    opening = openings[started % len(openings)]
+                    pending.add(pool.submit(play_selfplay_game, seed * 1000003 + started, depth,
+                                            random_plies, max_plies, opening))
+                    started += 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    writer.write(future.result())
+                    finished += 1
+                    if progress:
+                        progress(finished, writer.records)
+    finally:
+        writer.close()
+    return writer
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate self-play training data")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=2, help="search depth per move")
+    parser.add_argument("--random-plies", type=int, default=8, help="random opening moves per game")
+    parser.add_argument("--max-plies", type=int, default=200, help="adjudicate a draw after this many plies")
+    parser.add_argument("--openings", help="file with one FEN per line (default: start position)")
+    parser.add_argument("--workers", type=int, default=None, help="parallel games (default: CPU count)")
+    parser.add_argument("--out", default="selfplay", help="output directory")
+    parser.add_argument("--records-per-shard", type=int, default=DEFAULT_RECORDS_PER_SHARD)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.time()
+    def progress(finished, records):
+        rate = records / max(time.time() - start, 1e-9)
+        print(f"\r{finished}/{args.games} games, {records} positions ({rate:.0f}/s)", end="", flush=True)
+
+    openings = load_openings(args.openings) if args.openings else None
+    writer = generate(args.out, args.games, args.depth, args.random_plies, args.max_plies,
+                      args.workers, openings, args.seed, args.records_per_shard, progress)
+    print(f"\nWrote {writer.records} positions to {len(writer.paths)} shard(s) in {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Texel-style tuner for PIECE_VALUES and the piece-square tables.
+
+    python tuner.py selfplay/*.bin --iterations 2000 --output tuned.py
+    python tuner.py selfplay/*.bin --write    # update example.py in place
+
+Needs numpy. Positions come from self-play shards (see selfplay.py). They
+are turned into one int8 feature matrix when loaded. Each row holds the
+piece counts (White minus Black) and the piece-square occupancy for
+pawns, knights, bishops and kings, indexed like evaluate_position()
+indexes the tables. The material and piece-square part of the
+evaluation is then a single matrix-vector product.
+
+The rest of the engine's evaluation (mobility, centre, check, pawn
+structure and endgame knowledge) is not tuned. Loading runs the full
+evaluate_position() once per position, in a process pool, and keeps its
+difference to the linear part as a fixed offset per position. The tuned
+model is then the engine's own evaluation, so the tables don't absorb the
+other terms.
+
+The tuner first fits the sigmoid scale K to the current weights. It then
+minimises the mean squared error between sigmoid(K * eval / 400) and the
+game results with Adam, computing the loss and gradient over the whole
+data set as array operations.
+"""
+import argparse
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import example
+from example import PIECE_VALUES, PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, KING_MIDDLEGAME_TABLE
+from selfplay import BLACK_CODE, PIECE_CODES, memmap_shard, record_to_fen
+
+MATERIAL_TYPES = "PNBRQ"
+TABLES = (("P", "PAWN_TABLE"), ("N", "KNIGHT_TABLE"), ("B", "BISHOP_TABLE"), ("K", "KING_MIDDLEGAME_TABLE"))
+NUM_FEATURES = len(MATERIAL_TYPES) + 64 * len(TABLES)
+NOISY_MOVE = (example.CAPTURE | example.PROMOTION) << 12
+OFFSET_CHUNK = 2048  # Positions per pool task when computing the offsets
+
+def initial_weights():
+    """Current engine values as a weight vector"""
+    tables = {"PAWN_TABLE": PAWN_TABLE, "KNIGHT_TABLE": KNIGHT_TABLE,
+              "BISHOP_TABLE": BISHOP_TABLE, "KING_MIDDLEGAME_TABLE": KING_MIDDLEGAME_TABLE}
+    weights = [PIECE_VALUES[ptype] for ptype in MATERIAL_TYPES]
+    for _, name in TABLES:
+        weights.extend(value for row in tables[name] for value in row)
+    return np.array(weights, dtype=np.float64)
+
+# ========================
+# Loading
+# ========================
+def load_features(paths, quiet_only=True, workers=None):
+    """Feature matrix, White scores (1, 0.5, 0) and evaluation offsets of the shard positions
+
+    With quiet_only, positions in check or whose best move captures or
+    promotes are skipped, since their static evaluation is unreliable.
+    """
+    matrices, results, fens = [], [], []
+    for path in paths:
+        records = memmap_shard(path)
+        if quiet_only:
+            keep = ((records["flags"] & 32) == 0) & ((records["move"] & NOISY_MOVE) == 0)
+            records = records[keep]
+        if len(records) == 0:
+            continue
+        packed = np.frombuffer(records["board"].tobytes(), dtype=np.uint8).reshape(-1, 32)
+        codes = np.empty((len(packed), 64), dtype=np.uint8)
+        codes[:, 0::2] = packed & 15
+        codes[:, 1::2] = packed >> 4
+        matrices.append(position_features(codes))
+        results.append((records["result"].astype(np.float32) + 1) / 2)
+        fens.extend(record_to_fen((bytes(r["board"]), int(r["flags"]), int(r["ep_file"]),
+                                   int(r["halfmove"]))) for r in records)
+    if not matrices:
+        raise ValueError("No positions found")
+    features = np.concatenate(matrices)
+    return features, np.concatenate(results), evaluation_offsets(fens, features, workers)
+
+def position_features(codes):
+    """Features of positions given as (N, 64) arrays of square codes (a1..h8)"""
+    n = len(codes)
+    features = np.zeros((n, NUM_FEATURES), dtype=np.int8)
+    white = codes & BLACK_CODE == 0
+    ptypes = codes & 7
+    for i, ptype in enumerate(MATERIAL_TYPES):
+        is_type = ptypes == PIECE_CODES[ptype]
+        features[:, i] = (is_type & white).sum(axis=1) - (is_type & ~white & (codes != 0)).sum(axis=1)
+
+    # Table index y * 8 + x, with y flipped for Black as in evaluate_position()
+    squares = np.arange(64)
+    flipped = (7 - squares // 8) * 8 + squares % 8
+    rows = np.arange(n)[:, None].repeat(64, axis=1)
+    for t, (ptype, _) in enumerate(TABLES):
+        base = len(MATERIAL_TYPES) + 64 * t
+        is_type = ptypes == PIECE_CODES[ptype]
+        white_pieces = is_type & white
+        black_pieces = is_type & ~white & (codes != 0)
+        np.add.at(features, (rows[white_pieces], base + np.broadcast_to(squares, codes.shape)[white_pieces]), 1)
+        np.add.at(features, (rows[black_pieces], base + np.broadcast_to(flipped, codes.shape)[black_pieces]), -1)
+    return features
+
+def _engine_scores(fens):
+    """Full evaluate_position() score for White of each FEN, in a pool process"""
+    bot = example.ChessBot(example.WHITE)
+    game = example.ChessGame()
+    scores = []
+    for fen in fens:
+        game.load_fen(fen)
+        scores.append(bot.evaluate_position(game))
+    return scores
+
+def evaluation_offsets(fens, features, workers=None):
+    """Engine score minus the material and piece-square part at the current weights"""
+    chunks = [fens[i:i + OFFSET_CHUNK] for i in range(0, len(fens), OFFSET_CHUNK)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        scores = [score for part in pool.map(_engine_scores, chunks) for score in part]
+    linear = features.astype(np.float32) @ initial_weights().astype(np.float32)
+    return np.array(scores, dtype=np.float32) - linear
+
+# ========================
+# Optimisation
+# ========================
+def sigmoid(scores, k):
+    return 1.0 / (1.0 + np.power(10.0, -k * scores / 400.0))
+
+def evaluate(features, offsets, weights):
+    """Engine score for White of every position, with the untuned terms as fixed offsets"""
+    return features @ weights.astype(np.float32) + offsets
+
+def loss(features, offsets, results, weights, k):
+    predictions = sigmoid(evaluate(features, offsets, weights), k)
+    return float(np.mean((results - predictions) ** 2))
+
+def fit_k(features, offsets, results, weights, low=0.1, high=3.0, steps=40):
+    """Sigmoid scale that best fits the current weights (golden-section search)"""
+    scores = evaluate(features, offsets, weights)
+    def error(k):
+        return float(np.mean((results - sigmoid(scores, k)) ** 2))
+    ratio = (5 ** 0.5 - 1) / 2
+    a, b = low, high
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    for _ in range(steps):
+        if error(c) < error(d):
+            b = d
+        else:
+            a = c
+        c, d = b - ratio * (b - a), a + ratio * (b - a)
+    return (a + b) / 2
+
+def tune(features, offsets, results, weights, k, iterations=1000, learning_rate=1.0, progress=None):
+    """Minimise the evaluation error with Adam; returns the tuned weights"""
+    features = features.astype(np.float32, copy=False)
+    weights = weights.astype(np.float64).copy()
+    m = np.zeros_like(weights)
+    v = np.zeros_like(weights)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    scale = k * np.log(10.0) / 400.0
+    n = len(results)
+    for step in range(1, iterations + 1):
+        predictions = sigmoid(evaluate(features, offsets, weights), k)
+        error = predictions - results
+        # d/dw mean((p - r)^2) with p = sigmoid(k * x.w / 400)
+        gradient = (features.T @ (error * predictions * (1 - predictions))).astype(np.float64)
+        gradient *= 2 * scale / n
+        m = beta1 * m + (1 - beta1) * gradient
+        v = beta2 * v + (1 - beta2) * gradient ** 2
+        m_hat = m / (1 - beta1 ** step)
+        v_hat = v / (1 - beta2 ** step)
+        weights -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+        if progress and (step % 100 == 0 or step == iterations):
+            progress(step, float(np.mean(error ** 2)))
+    return weights
+
+# ========================
+# Export
+# ========================
+def format_tables(weights):
+    """Python source for PIECE_VALUES and the tables, in example.py's layout"""
+    values = np.rint(weights).astype(int)
+    material = {ptype: int(values[i]) for i, ptype in enumerate(MATERIAL_TYPES)}
+    material["K"] = PIECE_VALUES["K"]
+    blocks = ["PIECE_VALUES = {" + ", ".join(f'"{p}": {v}' for p, v in material.items()) + "}"]
+    for t, (_, name) in enumerate(TABLES):
+        base = len(MATERIAL_TYPES) + 64 * t
+        rows = ["    [" + ",".join(f"{int(v):3d}" for v in values[base + 8 * y:base + 8 * y + 8]) + "]"
+                for y in range(8)]
+        blocks.append(f"{name} = [\n" + ",\n".join(rows) + "\n]")
+    return blocks
+
+def write_engine(weights, path=example.__file__):
+    """Replace PIECE_VALUES and the tables in example.py with tuned values"""
+    with open(path) as f:
+        source = f.read()
+    for block in format_tables(weights):
+        name = block.split(" = ", 1)[0]
+        pattern = rf"^{name} = \{{[^\n]*\}}$" if name == "PIECE_VALUES" else rf"^{name} = \[\n.*?\n\]$"
+        source, count = re.subn(pattern, lambda _: block, source, count=1, flags=re.M | re.S)
+        if count != 1:
+            raise ValueError(f"Could not find {name} in {path}")
+    with open(path, "w") as f:
+        f.write(source)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluation on self-play positions")
+    parser.add_argument("shards", nargs="+", help="self-play shard files")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--learning-rate", type=float, default=1.0, help="Adam step size in centipawns")
+    parser.add_argument("--all-positions", action="store_true", help="keep positions in check or with a capture")
+    parser.add_argument("--workers", type=int, default=None, help="evaluation processes (default: CPU count)")
+    parser.add_argument("--output", help="write the tuned tables as Python source to this file")
+    parser.add_argument("--write", action="store_true", help="update the tables in example.py")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("The tuner needs numpy: pip install numpy")
+
+    features, results, offsets = load_features(args.shards, quiet_only=not args.all_positions,
+                                               workers=args.workers)
+    features = features.astype(np.float32)  # Convert once instead of on every product
+    weights = initial_weights()
+    k = fit_k(features, offsets, results, weights)
+    print(f"{len(results)} positions, K = {k:.3f}, "
+          f"initial error {loss(features, offsets, results, weights, k):.6f}")
+
+    def progress(step, error):
+        print(f"\riteration {step}/{args.iterations}: error {error:.6f}", end="", flush=True)
+
+    weights = tune(features, offsets, results, weights, k, args.iterations, args.learning_rate, progress)
+    print(f"\nfinal error {loss(features, offsets, results, weights, k):.6f}")
+    source = "\n\n".join(format_tables(weights)) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(source)
+        print(f"Tuned tables written to {args.output}")
+    if args.write:
+        write_engine(weights)
+        print(f"Updated {example.__file__}")
+    if not args.output and not args.write:
+        print(source)
+
+if __name__ == "__main__":
+    main()